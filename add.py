@@ -0,0 +1,165 @@
+from typing import Callable, Iterator
+from frozen import FrozenBDD
+
+# algebraic decision diagrams (ADDs, multi terminal BDDs): decision diagrams whose leafs hold values instead of
+# True/False, here the probability that remains after the variables that are not free are summed out
+# for the free sensors x both x and x_ stay variables of the ADD, every other variable is summed out with its
+# table like in FrozenBDD.weighted_count, so the leaf reached for an assignment of the free variables is the
+# probability of the diagram's function given these values; with the tables of the free sensors
+# sum of P(assignment) * value over all assignments gives the weighted count of the whole diagram again
+
+
+class ADD:
+    # nodes are numbered in the order they are created, a node is (level, low, high) or a leaf with a value on
+    # level len(variables); both are hash consed, so equal subdiagrams and equal values are stored once
+    def __init__(self, variables: list[str]):
+        self.variables = list(variables)
+        self.levels = {var: i for i, var in enumerate(self.variables)}
+        self.level = []
+        self.low = []
+        self.high = []
+        self.value = []  #None for internal nodes
+        self.unique = {}
+        self.root = None
+
+    def __len__(self):
+        return len(self.level)
+
+    def leaf(self, value) -> int:
+        return self.__add_node(("leaf", value), len(self.variables), None, None, value)
+
+    def node(self, level: int, low: int, high: int) -> int:
+        if low == high:
+            return low
+        return self.__add_node((level, low, high), level, low, high, None)
+
+    def __add_node(self, key: tuple, level: int, low, high, value) -> int:
+        index = self.unique.get(key)
+        if index is None:
+            index = self.unique[key] = len(self.level)
+            self.level.append(level)
+            self.low.append(low)
+            self.high.append(high)
+            self.value.append(value)
+        return index
+
+    def is_leaf(self, i: int) -> bool:
+        return self.level[i] == len(self.variables)
+
+    # ADD of operation(value of a, value of b), computed: results of earlier calls with the same operation
+    def apply(self, a: int, b: int, operation: Callable, computed: dict = None) -> int:
+        if computed is None:
+            computed = {}
+        key = (a, b)
+        if key in computed:
+            return computed[key]
+        if self.is_leaf(a) and self.is_leaf(b):
+            result = self.leaf(operation(self.value[a], self.value[b]))
+        else:
+            level = min(self.level[a], self.level[b])
+            a_low, a_high = (self.low[a], self.high[a]) if self.level[a] == level else (a, a)
+            b_low, b_high = (self.low[b], self.high[b]) if self.level[b] == level else (b, b)
+            result = self.node(level, self.apply(a_low, b_low, operation, computed),
+                               self.apply(a_high, b_high, operation, computed))
+        computed[key] = result
+        return result
+
+    # p * a + q * b for the numbers p and q
+    def combine(self, p, a: int, q, b: int) -> int:
+        scaled_a = self.apply(a, self.leaf(p), lambda x, y: x * y)
+        scaled_b = self.apply(b, self.leaf(q), lambda x, y: x * y)
+        return self.apply(scaled_a, scaled_b, lambda x, y: x + y)
+
+    # value for an assignment of the variables, one step per level, variables the path doesn't test are ignored
+    def lookup(self, assignment: dict[str, bool], root: int = None):
+        i = self.root if root is None else root
+        while not self.is_leaf(i):
+            i = self.high[i] if assignment[self.variables[self.level[i]]] else self.low[i]
+        return self.value[i]
+
+    # (partial assignment, value) for every path from the root to a leaf, the paths cover all assignments once
+    def items(self, root: int = None) -> Iterator[tuple[dict[str, bool], object]]:
+        stack = [(self.root if root is None else root, {})]
+        while stack:
+            i, assignment = stack.pop()
+            if self.is_leaf(i):
+                yield assignment, self.value[i]
+                continue
+            var = self.variables[self.level[i]]
+            stack.append((self.high[i], dict(assignment, **{var: True})))
+            stack.append((self.low[i], dict(assignment, **{var: False})))
+
+    # number of internal nodes and leafs reachable from the root
+    def size(self, root: int = None) -> tuple[int, int]:
+        seen = set()
+        stack = [self.root if root is None else root]
+        while stack:
+            i = stack.pop()
+            if i not in seen:
+                seen.add(i)
+                if not self.is_leaf(i):
+                    stack += (self.low[i], self.high[i])
+        leafs = sum(self.is_leaf(i) for i in seen)
+        return len(seen) - leafs, leafs
+
+
+# variables of the diagram kept in the ADD: x and x_ of every free sensor x
+def free_variables(variables: list[str], free: list[str]) -> list[str]:
+    unknown = set(free) - {var[:-1] if var.endswith("_") else var for var in variables}
+    if unknown:
+        raise Exception(f"free variables {sorted(unknown)} not in {list(variables)}")
+    return [var for var in variables if var in free or (var.endswith("_") and var[:-1] in free)]
+
+
+# root of the ADD of bdd in add, the variables not in add.variables are summed out with their tables
+# same bottom up pass as FrozenBDD.weighted_count, with ADDs instead of numbers as node values
+def weighted_add(bdd: FrozenBDD, probabilities: dict[str, list], add: ADD) -> int:
+    # x'\x     0        1
+    # 0    [0] p00  [1] p10
+    # 1    [2] p01  [3] p11
+    any_table = next(iter(probabilities.values()))
+    zero = 0 * any_table[0]
+    size = len(bdd.level)
+    table_variables = [var[:-1] if alt else var for var, alt in zip(bdd.variables, bdd.alt)]
+    #level of the diagram -> level of the ADD, None for the variables that are summed out
+    add_level = [add.levels.get(var) for var in bdd.variables]
+    value = [add.leaf(zero), add.leaf(zero + 1)] + [None] * (size - 2)
+    conditional = ({}, {})  #alt nodes given x = 0 or x = 1, only for summed out variables
+
+    def child_value(level: int, child: int, bit: int) -> int:
+        if child > bdd.TRUE and child in conditional[bit] and table_variables[bdd.level[child]] == bdd.variables[level]:
+            return conditional[bit][child]
+        return value[child]
+
+    for i in range(size - 1, bdd.TRUE, -1):
+        level = bdd.level[i]
+        if add_level[level] is not None:
+            value[i] = add.node(add_level[level], value[bdd.negative[i]], value[bdd.positive[i]])
+            continue
+        table = probabilities[table_variables[level]]
+        if not bdd.alt[level]:
+            value[i] = add.combine(table[0] + table[2], child_value(level, bdd.negative[i], 0),
+                                   table[1] + table[3], child_value(level, bdd.positive[i], 1))
+            continue
+        negative = value[bdd.negative[i]]
+        positive = value[bdd.positive[i]]
+        value[i] = add.combine(table[0] + table[1], negative, table[2] + table[3], positive)
+        for bit, (p_not_perceived, p_perceived) in enumerate(((table[0], table[2]), (table[1], table[3]))):
+            total = p_not_perceived + p_perceived
+            if total:
+                conditional[bit][i] = add.combine(p_not_perceived / total, negative, p_perceived / total, positive)
+            else:
+                conditional[bit][i] = add.leaf(zero)
+    return value[bdd.root]
+
+
+# ADD over x and x_ of the free sensors whose leafs are (tp, fp) given the values of these variables
+# tp and fp are the diagrams of Model.calc_tp_fp over the same interleaved variables
+def tp_fp_add(tp: FrozenBDD, fp: FrozenBDD, probabilities: dict[str, list], free: list[str]) -> ADD:
+    if tp.variables != fp.variables:
+        raise Exception("variables of the tp and fp diagrams don't match")
+    add = ADD(free_variables(list(tp.variables), free))
+    tp_root = weighted_add(tp, probabilities, add)
+    fp_root = weighted_add(fp, probabilities, add)
+    add.root = add.apply(tp_root, fp_root, lambda tp_value, fp_value: (tp_value, fp_value))
+    return add
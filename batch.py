@@ -0,0 +1,100 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from gmpy2 import mpq
+from bdd import BDD
+from model import Model
+
+# configurations are read from
+# json: a list of {"name", "threshold", "f_guard", "unobservable", "probabilities": {var: [p00, p10, p01, p11]}}
+# csv:  the columns name, threshold, f_guard, unobservable and probabilities, the last one holds the JSON object
+# probabilities are given as numbers or as strings like "1/5" or "0.2", which are read exactly
+# results are written as one JSON object per line in the order the jobs finish
+
+
+def read_configs(path: str) -> list[dict]:
+    with open(path, newline="") as file:
+        if path.endswith(".csv"):
+            configs = [dict(row, probabilities=json.loads(row["probabilities"])) for row in csv.DictReader(file)]
+        else:
+            configs = json.load(file)
+    for i, config in enumerate(configs):
+        missing = {"threshold", "f_guard", "unobservable", "probabilities"} - config.keys()
+        if missing:
+            raise Exception(f"configuration {i} misses {sorted(missing)}")
+        config.setdefault("name", f"config_{i}")
+    return configs
+
+
+def parse_probabilities(probabilities: dict) -> dict[str, list[mpq]]:
+    return {var: [mpq(p) for p in table] for var, table in probabilities.items()}
+
+
+#reduced guard BDDs of this worker process, configurations often share guards over the same variables
+_guards: dict[tuple[str, tuple[str, ...]], BDD] = {}
+
+
+def _guard(expression: str, variables: list[str]) -> BDD:
+    key = (expression, tuple(variables))
+    if key not in _guards:
+        bdd = BDD(expression, variables)
+        bdd.reduce()
+        _guards[key] = bdd
+    #Model copies the BDD, the cached one stays untouched by algorithm
+    return _guards[key]
+
+
+def run_config(config: dict) -> dict:
+    start = time.perf_counter()
+    try:
+        probabilities = parse_probabilities(config["probabilities"])
+        variables = list(probabilities.keys())
+        model = Model(float(config["threshold"]), _guard(config["unobservable"], variables),
+                      _guard(config["f_guard"], variables), probabilities)
+        result = model.algorithm(config["name"], verbose=False)
+    except Exception as e:
+        return {"name": config["name"], "error": f"{type(e).__name__}: {e}"}
+    return {
+        "name": config["name"],
+        "tp_initial": float(result.tp_initial),
+        "fp_initial": float(result.fp_initial),
+        "tp_final": float(result.tp_final),
+        "fp_final": float(result.fp_final),
+        "acceptable": result.acceptable,
+        "iterations": result.iterations,
+        "seconds": round(time.perf_counter() - start, 6),
+    }
+
+
+# runs Model.algorithm for every configuration on a process pool, each result is written and flushed
+# as soon as its job is done; returns the number of failed configurations
+def run_batch(configs: list[dict], output: str, workers: int = None) -> int:
+    failed = 0
+    with open(output, "w") as out, ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        jobs = [pool.submit(run_config, config) for config in configs]
+        for job in as_completed(jobs):
+            result = job.result()
+            failed += "error" in result
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="run Model.algorithm for many configurations in parallel")
+    parser.add_argument("configs", help="JSON or CSV file with the configurations")
+    parser.add_argument("--output", default="batch_results.jsonl")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, all cores by default")
+    args = parser.parse_args(argv)
+
+    configs = read_configs(args.configs)
+    failed = run_batch(configs, args.output, args.workers)
+    print(f"{len(configs) - failed} of {len(configs)} configurations done, results in {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,15 @@
 from __future__ import annotations
 from collections import deque
+import heapq
+import itertools
 from typing import Optional
 import re
 import os
 import glob
 import shutil
-from gmpy2 import mpq
+import instrumentation
+import tracing
+from tracing import TraceLevel
 
 # deletes all files from the out folder 
 def delete_all_files_from_out():
@@ -37,7 +41,6 @@ class BDDNode:
             self.assignments = []
         else:
             self.assignments = assignments
-        self.drawn = False
 
     def isLeaf(self):
         return self.value is not None and self.variable is None
@@ -67,6 +70,8 @@ class BDDNode:
         return BDDNode(var=var, value=value, assignments=node_assignment_copy, is_alt=is_alt)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if other is None or not isinstance(other, BDDNode):
             return False
         if self.isLeaf() and other.isLeaf():
@@ -83,10 +88,42 @@ class BDDNode:
         )
 
     def __hash__(self):
-        # Hash für Leaf-Nodes basierend auf ihrem Wert, ansonsten auf (var, left, right)
+        # Hash für Leaf-Nodes basierend auf ihrem Wert, ansonsten auf (var, var/value der Kinder)
+        # nur eine Ebene tief, ein rekursiver Hash wächst mit der Anzahl der Pfade
         if self.isLeaf():
             return hash(self.value)
-        return hash((self.variable, self.negative_child, self.positive_child))
+        return hash((self.variable, _shallow_key(self.negative_child), _shallow_key(self.positive_child)))
+
+
+#name of the node's variable as it appears in the variable order, alt variables end with "_"
+def variable_name(node: BDDNode) -> str:
+    return node.variable + "_" if node.is_alt else node.variable
+
+
+def _shallow_key(node: Optional[BDDNode]):
+    if node is None:
+        return None
+    return node.value if node.isLeaf() else node.variable
+
+
+#operators of BDD.apply, applied to the values of two leafs
+OPERATORS = {
+    "and": lambda a, b: a and b,
+    "or": lambda a, b: a or b,
+}
+#leaf value that decides the result of the operator regardless of the other operand
+CONTROLLING = {"and": False, "or": True}
+
+
+# computed table of BDD.apply, maps pairs of node ids to the united node
+class ComputedTable(dict):
+    def __init__(self, operator: str, variable_order: list[str]):
+        super().__init__()
+        self.levels = {var: i for i, var in enumerate(variable_order)}
+        self.operation = OPERATORS[operator]
+        self.controlling = CONTROLLING[operator]
+        self.hits = 0
+
 
 class BDD:
     def __init__(self, expression: str, variables: list[str], build_new=True):
@@ -96,12 +133,15 @@ class BDD:
         self.leafs = {False: BDDNode(value=False), True: BDDNode(value=True)}
         self.root = None
         self.probabilities_set = False
+        self.compiled = {}  #evaluators generated from the current diagram, cleared by invalidate
+        self.trace_level = TraceLevel.OFF  #level used by generateDot if none is given
         if build_new:
             self.build_new()
 
     def build_new(self):
         empty_dict = {}
-        self.root = self.build(0, empty_dict)
+        with instrumentation.phase("build"):
+            self.root = self.build(0, empty_dict)
 
     def build(self, var_index, current_assignment: dict):
         # end of recursion if node is a leaf
@@ -131,75 +171,132 @@ class BDD:
         return current_node
 
     def reduce(self):
-        if not self.root.hasChildren:
-            print("BDD only has root.")
+        if not self.root.hasChildren():
+            #constant function, nothing to reduce
             return False
-        self.__merge_leafs(self.root)
-        self.__remove_duplicate_subtree(self.root, mem={})
-        self.__remove_equivalent_child_nodes(self.root)
+        with instrumentation.phase("reduce"):
+            if instrumentation.enabled():
+                instrumentation.sample("reduce.nodes_before", self.node_count())
+            self.__merge_leafs(self.root)
+            unique_table = {}
+            self.__remove_duplicate_subtree(self.root, mem=unique_table)
+            self.__remove_equivalent_child_nodes(self.root)
+            #children of the root can become identical while its subtrees are reduced
+            while not self.root.isLeaf() and self.root.negative_child is self.root.positive_child:
+                self.root = self.root.negative_child
+            self.invalidate()
+            if instrumentation.enabled():
+                instrumentation.sample("reduce.nodes_after", self.node_count())
+                instrumentation.sample("reduce.unique_table_size", len(unique_table))
 
         #print("Reduction done.")
         return True
 
-    def __remove_duplicate_subtree(self, node: BDDNode, mem: dict[BDDNode, BDDNode]):
+    #mem is the unique table: (variable, is_alt, id of negative child, id of positive child) -> node
+    #the children are reduced first, so equal subtrees share the same child objects
+    def __remove_duplicate_subtree(self, node: BDDNode, mem: dict[tuple, BDDNode], visited: dict[int, BDDNode] = None):
         if node.isLeaf():
             return node
+        if visited is None:
+            visited = {}
+        if id(node) in visited:
+            return visited[id(node)]
+
+        node.negative_child = self.__remove_duplicate_subtree(node.negative_child, mem, visited)
+        node.positive_child = self.__remove_duplicate_subtree(node.positive_child, mem, visited)
+        key = (node.variable, node.is_alt, id(node.negative_child), id(node.positive_child))
+        if key in mem:
+            self.add_assignments(mem[key], node.assignments)
+            canonical = mem[key]
+        else:
+            mem[key] = canonical = node
+        visited[id(node)] = canonical
+        return canonical
 
-        if node in mem:
-            self.add_assignments(mem[node], node.assignments)
-            return mem[node]
-
-        node.negative_child = self.__remove_duplicate_subtree(node.negative_child, mem)
-        node.positive_child = self.__remove_duplicate_subtree(node.positive_child, mem)
-        mem[node] = node
-        return node
-
-    def __merge_leafs(self, node: BDDNode) -> Optional[BDDNode]:
+    def __merge_leafs(self, node: BDDNode, visited: set[int] = None) -> Optional[BDDNode]:
         if node is None:
             raise Exception("unexpected Node is None")
 
         if node.isLeaf():
             return node
+        if visited is None:
+            visited = set()
+        if id(node) in visited:
+            return None
+        visited.add(id(node))
 
-        child_node_negative_child = self.__merge_leafs(node.negative_child)
+        child_node_negative_child = self.__merge_leafs(node.negative_child, visited)
         if child_node_negative_child is not None:
             leaf = self.leafs[child_node_negative_child.value]
-            self.add_assignments(leaf, child_node_negative_child.assignments)
+            if child_node_negative_child is not leaf:
+                self.add_assignments(leaf, child_node_negative_child.assignments)
             node.negative_child = leaf
 
-        child_node_positive_child = self.__merge_leafs(node.positive_child)
-        if child_node_positive_child is not None and child_node_positive_child not in self.leafs:
+        child_node_positive_child = self.__merge_leafs(node.positive_child, visited)
+        if child_node_positive_child is not None:
             leaf = self.leafs[child_node_positive_child.value]
-            self.add_assignments(leaf, child_node_positive_child.assignments)
+            if child_node_positive_child is not leaf:
+                self.add_assignments(leaf, child_node_positive_child.assignments)
             node.positive_child = leaf
             
         return None
 
-    def __remove_equivalent_child_nodes(self, node: BDDNode) -> Optional[BDDNode]:
+    def __remove_equivalent_child_nodes(self, node: BDDNode, mem: dict[int, Optional[BDDNode]] = None) \
+            -> Optional[BDDNode]:
+        if mem is None:
+            mem = {}
         #if root is reducable reduce it and set new root
-        if node == self.root:
-            while self.root.negative_child == self.root.positive_child:
+        if node is self.root:
+            while not self.root.isLeaf() and self.root.negative_child == self.root.positive_child:
                 self.root = self.root.negative_child
                 node = self.root
+        if id(node) in mem:
+            return mem[id(node)]
         
         if node.negative_child is not None:
-            child_of_neg_child = self.__remove_equivalent_child_nodes(node.negative_child)
+            child_of_neg_child = self.__remove_equivalent_child_nodes(node.negative_child, mem)
             #if not None, the children of the neg child node are identical -> original negative child gets skipped over
             if child_of_neg_child is not None:
                 node.negative_child = child_of_neg_child
 
         if node.positive_child is not None:
-            child_of_pos_child = self.__remove_equivalent_child_nodes(node.positive_child)
+            child_of_pos_child = self.__remove_equivalent_child_nodes(node.positive_child, mem)
             #equivalent to negative child
             if child_of_pos_child is not None:
                 node.positive_child = child_of_pos_child
 
         #negative child is same as positive child and said child is returned
+        result = None
         if node.negative_child is not None and node.positive_child is not None and id(node.negative_child) == id(
                 node.positive_child):
-            return node.negative_child
-        
-        return None
+            result = node.negative_child
+        mem[id(node)] = result
+        return result
+
+    #number of distinct nodes (leafs included) reachable from the root
+    def node_count(self) -> int:
+        return len(self.breadth_first_bottom_up_search())
+
+    #sets the assignments of every node to the partial assignments leading to it, like build does for
+    #diagrams that were constructed directly; the number of assignments grows exponentially with the variables
+    def annotate_assignments(self):
+        levels = {var: i for i, var in enumerate(self.variables)}
+        for node in self.breadth_first_bottom_up_search():
+            node.assignments = []
+        self.__annotate_assignments_recursion(self.root, 0, {}, levels)
+
+    def __annotate_assignments_recursion(self, node: BDDNode, level: int, assignment: dict, levels: dict[str, int]):
+        node_level = len(self.variables) if node.isLeaf() else levels[variable_name(node)]
+        var = self.variables[level] if level < len(self.variables) else None
+        if level < node_level:
+            #variable was skipped by the reduction, both values lead to the same node
+            for value in (False, True):
+                self.__annotate_assignments_recursion(node, level + 1, {**assignment, var: value}, levels)
+            return
+        node.assignments.append(assignment)
+        if not node.isLeaf():
+            self.__annotate_assignments_recursion(node.negative_child, level + 1, {**assignment, var: False}, levels)
+            self.__annotate_assignments_recursion(node.positive_child, level + 1, {**assignment, var: True}, levels)
 
     #adds assignments that are not already in the node
     @staticmethod
@@ -227,6 +324,13 @@ class BDD:
     #TODO: assignment not set properly
     @staticmethod
     def unite(BDD1: BDD, BDD2: BDD, variable_order: list) -> BDD:
+        return BDD.apply(BDD1, BDD2, variable_order, "and")
+
+    #combines two BDDs with one of the operators of OPERATORS, unite is apply with "and"
+    @staticmethod
+    def apply(BDD1: BDD, BDD2: BDD, variable_order: list, operator: str) -> BDD:
+        if operator not in OPERATORS:
+            raise Exception(f"unknown operator {operator}, expected one of {list(OPERATORS)}")
         for var in BDD1.variables:
             if var not in variable_order:
                 raise Exception("Variable " + var + " from BDD1 not found in variables.")
@@ -235,36 +339,62 @@ class BDD:
             if var not in variable_order:
                 raise Exception("Variable " + var + " from BDD2 not found in variables.")
 
-        united_bdd = BDD(expression="(" + BDD1.expression + ")and(" + BDD2.expression + ")", variables=variable_order,
-                         build_new=False)
-        united_bdd.root = BDD.__unite_helper(BDD1.root, BDD2.root, variable_order, united_bdd)
+        united_bdd = BDD(expression="(" + BDD1.expression + ")" + operator + "(" + BDD2.expression + ")",
+                         variables=variable_order, build_new=False)
+        with instrumentation.phase("unite"):
+            computed = ComputedTable(operator, variable_order)
+            united_bdd.root = BDD.__unite_helper(BDD1.root, BDD2.root, variable_order, united_bdd, computed)
+            instrumentation.count("apply.cache_hits", computed.hits)
+            instrumentation.count("apply.cache_misses", len(computed))
         united_bdd.reduce()
         return united_bdd
 
+    #computed maps pairs of already united nodes to their result, so shared subtrees are only united once
     @staticmethod
-    def __unite_helper(node1: BDDNode, node2: BDDNode, variable_order: list[str], united_bdd: BDD) -> BDDNode:
+    def __unite_helper(node1: BDDNode, node2: BDDNode, variable_order: list[str], united_bdd: BDD,
+                       computed: ComputedTable = None) -> BDDNode:
+        if computed is None:
+            computed = ComputedTable("and", variable_order)
+        key = (id(node1), id(node2))
+        if key in computed:
+            computed.hits += 1
+            return computed[key]
+        solution = BDD.__unite_nodes(node1, node2, variable_order, united_bdd, computed)
+        computed[key] = solution
+        return solution
+
+    @staticmethod
+    def __unite_nodes(node1: BDDNode, node2: BDDNode, variable_order: list[str], united_bdd: BDD,
+                      computed: ComputedTable) -> BDDNode:
         node1_var = None
         node2_var = None
         if node1.variable:
             #add "_" if var is alt, so it can be looked up in variabole order
             node1_var = node1.variable + "_" if node1.is_alt else node1.variable
-            if node1_var not in variable_order:
+            if node1_var not in computed.levels:
                 raise Exception(f"{node1_var} not in variable order {variable_order}.")
         if node2.variable:
             node2_var = node2.variable + "_" if node2.is_alt else node2.variable
-            if node2_var not in variable_order:
+            if node2_var not in computed.levels:
                 raise Exception(f"{node2_var} not in variable order {variable_order}.")
 
+        # a leaf with the controlling value (False for and, True for or) decides the result on its own
+        for node in (node1, node2):
+            if node.isLeaf() and node.value == computed.controlling:
+                return BDDNode(value=computed.controlling)
+
         # if both nodes are leafs return new leaf with united value
         if node1.isLeaf() and node2.isLeaf():
-            solution = BDDNode(value = node1.value and node2.value)
+            solution = BDDNode(value=computed.operation(node1.value, node2.value))
             return solution
 
         # if both nodes are of the same variable unite the negative children and positive children of both bdd
         elif node1_var == node2_var:
             solution = BDDNode(var=node1_var, is_alt=node1.is_alt)
-            solution.negative_child = BDD.__unite_helper(node1.negative_child, node2.negative_child, variable_order, united_bdd)
-            solution.positive_child = BDD.__unite_helper(node1.positive_child, node2.positive_child, variable_order, united_bdd)
+            solution.negative_child = BDD.__unite_helper(node1.negative_child, node2.negative_child, variable_order, united_bdd,
+                                                           computed)
+            solution.positive_child = BDD.__unite_helper(node1.positive_child, node2.positive_child, variable_order, united_bdd,
+                                                           computed)
             if solution.negative_child is None or solution.positive_child is None:
                 raise Exception("Children are None")
             #solution.reduce(united_bdd)
@@ -273,10 +403,9 @@ class BDD:
         # if variables don't match determine higher priority variable and unite children of higher prio variable with
         # lower prio BDD
         else:
-            gen = (var for var in variable_order if var == node1_var or var == node2_var)
-            higher_variable = next(gen)
-
-            if node1_var == higher_variable:
+            #leafs come after all variables
+            levels = computed.levels
+            if levels.get(node1_var, len(levels)) < levels.get(node2_var, len(levels)):
                 higher_prio = node1
                 lower_prio = node2
             else:
@@ -284,8 +413,10 @@ class BDD:
                 lower_prio = node1
 
             solution = BDDNode(var=higher_prio.variable, is_alt=higher_prio.is_alt)
-            solution.negative_child = BDD.__unite_helper(higher_prio.negative_child, lower_prio, variable_order, united_bdd)
-            solution.positive_child = BDD.__unite_helper(higher_prio.positive_child, lower_prio, variable_order, united_bdd)
+            solution.negative_child = BDD.__unite_helper(higher_prio.negative_child, lower_prio, variable_order, united_bdd,
+                                                           computed)
+            solution.positive_child = BDD.__unite_helper(higher_prio.positive_child, lower_prio, variable_order, united_bdd,
+                                                           computed)
             if (solution.negative_child is None) or (solution.positive_child is None):
                 raise Exception("Children are None")
             #TODO: doesn't work with reduced bdd's 
@@ -313,12 +444,15 @@ class BDD:
         bdd_copy = BDD(expression_copy, var_copy, build_new=False)
         bdd_copy.root = self.__replace_children_nodes(self.root, {}, rename)
         bdd_copy.__merge_leafs(bdd_copy.root)
+        if bdd_copy.root.isLeaf():
+            #constant function, negate swaps the values of the shared leafs
+            bdd_copy.root = bdd_copy.leafs[bdd_copy.root.value]
         return bdd_copy
 
-    def __replace_children_nodes(self, original_node: BDDNode, visited_nodes: dict[BDDNode, BDDNode], is_alt: bool):
+    def __replace_children_nodes(self, original_node: BDDNode, visited_nodes: dict[int, BDDNode], is_alt: bool):
         #if original node is already copied use the copy
-        if original_node in visited_nodes:
-            node_copy = visited_nodes[original_node]
+        if id(original_node) in visited_nodes:
+            node_copy = visited_nodes[id(original_node)]
             return node_copy
 
         if original_node.isLeaf():
@@ -329,14 +463,20 @@ class BDD:
         node_copy.negative_child = self.__replace_children_nodes(original_node.negative_child, visited_nodes, is_alt)
         node_copy.positive_child = self.__replace_children_nodes(original_node.positive_child, visited_nodes, is_alt)
         #map copy of Node to the original node
-        visited_nodes[original_node] = node_copy
+        visited_nodes[id(original_node)] = node_copy
         return node_copy
 
     #only use if original and alternative Variables are united
     def set_probabilities(self, probabilities: dict[str: list[mpq]]):
+        with instrumentation.phase("set_probabilities"):
+            self.__set_probabilities(probabilities)
+
+    def __set_probabilities(self, probabilities: dict[str: list[mpq]]):
         root = self.root
         if root.isLeaf():
-            raise Exception("Tree needs at least one Node that isn't a leaf!")
+            #constant function, the sum is the leaf value
+            self.probabilities_set = True
+            return
         #root handled separately because it does not have a parent node
         if not root.is_alt:
             #p of only x
@@ -347,7 +487,7 @@ class BDD:
             #p of only x_
             root.negative_probability[root] = probabilities[root.variable][0] + probabilities[root.variable][1]
             #p of only not x_
-            root.positive_probability[root] = probabilities[root.variable][1] + probabilities[root.variable][0]
+            root.positive_probability[root] = probabilities[root.variable][2] + probabilities[root.variable][3]
         self.__set_probabilities_recursion(root, probabilities)
         self.probabilities_set = True
         return
@@ -424,14 +564,16 @@ class BDD:
     def sum_probabilities_positive_cases(self):
         if not self.probabilities_set:
             raise Exception("Set the probabilities first.")
-        return self.__sum_probabilities_helper(self.root, self.root, path_mul=mpq(1))
+        from gmpy2 import mpq
+        with instrumentation.phase("sum"):
+            return self.__sum_probabilities_helper(self.root, self.root, path_mul=mpq(1))
 
     def __sum_probabilities_helper(self, current_node: BDDNode, parent_node: BDDNode, path_mul: mpq) -> mpq:
         #sum of path is complete
         if current_node.isLeaf():
             #don't sum probabilities of paths that end in zero
             if current_node.value == 0:
-                return mpq(0)
+                return path_mul * 0
             else:
                 return path_mul
         else:
@@ -447,7 +589,66 @@ class BDD:
 
             return mul_negative_path + mul_positive_path
 
+    #returns the k paths to the True leaf with the highest probability as (partial assignment, probability),
+    #highest first; only use if probabilities are set
+    #best[(node, parent)] is the highest probability of a path from node to the True leaf, it is an exact bound
+    #for the best first search, so complete paths leave the heap in order of their probability
+    def top_k_paths(self, k: int) -> list[tuple[dict[str, bool], mpq]]:
+        if not self.probabilities_set:
+            raise Exception("Set the probabilities first.")
+        from gmpy2 import mpq
+        if self.root.isLeaf():
+            return [({}, mpq(1))] if self.root.value and k > 0 else []
+
+        #best[(id(node), id(parent))]: probability of the best path from node to True when node is entered from parent
+        #built along the edges of the diagram, the probability dicts can't be iterated for the parents: their keys
+        #compare equal for x and x_ with the same children, so one of the two parents is missing
+        best = {}
+
+        def completion(child: BDDNode, parent: BDDNode):
+            if child.isLeaf():
+                return mpq(1) if child.value else mpq(0)
+            return best[(id(child), id(parent))]
+
+        def best_below(node: BDDNode, parent: BDDNode):
+            return max(node.negative_probability[parent] * completion(node.negative_child, node),
+                       node.positive_probability[parent] * completion(node.positive_child, node))
+
+        for node in self.nodes_bottom_up():
+            if node.isLeaf():
+                continue
+            for child in (node.negative_child, node.positive_child):
+                if not child.isLeaf():
+                    best[(id(child), id(node))] = best_below(child, node)
+        best[(id(self.root), id(self.root))] = best_below(self.root, self.root)
+
+        paths = []
+        counter = itertools.count()
+        #entries: (-upper bound, tie breaker, node, parent, probability so far, path as linked (previous, edge))
+        heap = [(-best[(id(self.root), id(self.root))], next(counter), self.root, self.root, mpq(1), None)]
+        while heap and len(paths) < k:
+            bound, _, node, parent, probability, path = heapq.heappop(heap)
+            if bound == 0:
+                break
+            if node.isLeaf():
+                cube = {}
+                while path is not None:
+                    path, (var, value) = path
+                    cube[var] = value
+                paths.append((dict(reversed(cube.items())), probability))
+                continue
+            name = variable_name(node)
+            for child, edge_probability, value in ((node.negative_child, node.negative_probability[parent], False),
+                                                    (node.positive_child, node.positive_probability[parent], True)):
+                child_probability = probability * edge_probability
+                child_bound = child_probability * completion(child, node)
+                if child_bound > 0:
+                    heapq.heappush(heap, (-child_bound, next(counter), child, node, child_probability,
+                                          (path, (name, value))))
+        return paths
+
     def sum_all_probability_paths(self):
+        from gmpy2 import mpq
         self.__sum_all_probability_paths_recursion(current_node=self.root, visited_nodes={self.root: mpq(1)})
         return
 
@@ -484,6 +685,104 @@ class BDD:
 
         return all_path_sum
 
+    #has to be called after nodes were changed outside of reduce, drops the compiled evaluators
+    def invalidate(self):
+        self.compiled.clear()
+
+    #evaluates the BDD for every row of a boolean NumPy matrix of shape (samples, len(variables))
+    def evaluate_batch(self, observations):
+        if "arrays" not in self.compiled:
+            from vectorized import ArrayBDD
+            self.compiled["arrays"] = ArrayBDD(self)
+        with instrumentation.phase("evaluate_batch"):
+            return self.compiled["arrays"].evaluate(observations)
+
+    #probability of the positive cases for the 2x2 tables without setting them on the nodes
+    #exact: FrozenBDD.weighted_count, in the number type of the tables; float: the NumPy kernel of ArrayBDD
+    def weighted_count(self, probabilities: dict[str, list], backend: str = "exact"):
+        if backend == "float":
+            if "arrays" not in self.compiled:
+                from vectorized import ArrayBDD
+                self.compiled["arrays"] = ArrayBDD(self)
+            with instrumentation.phase("sum"):
+                return self.compiled["arrays"].weighted_count(probabilities)
+        if backend != "exact":
+            raise Exception(f"unknown backend {backend}, expected exact or float")
+        with instrumentation.phase("sum"):
+            return self.freeze().weighted_count(probabilities)
+
+    #generated Python function evaluating the BDD, see codegen.generate_source for the styles
+    #ifelse: f(v0, v1, ...) with one value per variable, bitmask: f(m) with bit i for variable i
+    def compile(self, style: str = "ifelse"):
+        if style not in self.compiled:
+            from codegen import compile_bdd
+            self.compiled[style] = compile_bdd(self, style)
+        return self.compiled[style]
+
+    #read only snapshot that can be shared between threads, see frozen.FrozenBDD
+    def freeze(self):
+        from frozen import FrozenBDD
+        return FrozenBDD(self)
+
+    #index of each variable name in the variable order
+    def variable_levels(self) -> dict[str, int]:
+        return {var: i for i, var in enumerate(self.variables)}
+
+    #all nodes sorted by their level, leafs first, every node comes after its children
+    def nodes_bottom_up(self) -> list[BDDNode]:
+        levels = self.variable_levels()
+        n = len(self.variables)
+        return sorted(self.breadth_first_bottom_up_search(),
+                      key=lambda node: n if node.isLeaf() else levels[variable_name(node)], reverse=True)
+
+    #yields the paths to leafs with the given value one at a time as partial assignments,
+    #variables that are not tested on a path (don't cares) are left out of its assignment
+    def iter_cubes(self, value: bool = True):
+        #nodes without a path to the wanted leaf are not entered
+        reaches = {}
+        for node in self.nodes_bottom_up():
+            if node.isLeaf():
+                reaches[id(node)] = node.value == value
+            else:
+                reaches[id(node)] = reaches[id(node.negative_child)] or reaches[id(node.positive_child)]
+        if not reaches[id(self.root)]:
+            return
+
+        path = []
+        #entries: (node, length of the path above the edge to the node, (variable, value) of that edge)
+        stack = [(self.root, 0, None)]
+        while stack:
+            node, depth, edge = stack.pop()
+            del path[depth:]
+            if edge is not None:
+                path.append(edge)
+            if node.isLeaf():
+                yield dict(path)
+                continue
+            name = variable_name(node)
+            if reaches[id(node.positive_child)]:
+                stack.append((node.positive_child, len(path), (name, True)))
+            if reaches[id(node.negative_child)]:
+                stack.append((node.negative_child, len(path), (name, False)))
+
+    #number of full assignments of the variables that lead to a leaf with the given value,
+    #one pass over the nodes; variables skipped by the reduction double the count of an edge
+    def sat_count(self, value: bool = True) -> int:
+        levels = self.variable_levels()
+        n = len(self.variables)
+
+        def level(node: BDDNode):
+            return n if node.isLeaf() else levels[variable_name(node)]
+
+        counts = {}
+        for node in self.nodes_bottom_up():
+            if node.isLeaf():
+                counts[id(node)] = 1 if node.value == value else 0
+                continue
+            counts[id(node)] = sum(counts[id(child)] << (level(child) - level(node) - 1)
+                                   for child in (node.negative_child, node.positive_child))
+        return counts[id(self.root)] << level(self.root)
+
     # returns list of all nodes in breadth first bottom up order
     def breadth_first_bottom_up_search(self) -> list[BDDNode]:
         out = []
@@ -492,9 +791,9 @@ class BDD:
 
         while queue:
             node = queue.popleft()
-            if node in visited:
+            if id(node) in visited:
                 continue
-            visited.add(node)
+            visited.add(id(node))
             out.append(node)
 
             if node.negative_child:
@@ -506,88 +805,24 @@ class BDD:
         return out
 
     # Visualization
-    def generateDot(self, path="output"):
-        #add "_" to node label if BDD is alternative version of another BDD
-        node = self.root
-        alt_str = "_" if node.is_alt else ""
-        label = node.value if node.isLeaf() else node.variable + alt_str
-
-        #make file
-        path = f"out\\{path}.dot"
-        directory = os.path.dirname(path)
-
-        os.makedirs(directory, exist_ok=True)
-        out = open(path, "w")
-
-        #write start of the dot file and the root node
-        out.write(f"digraph{{\nlabel=\"{self.expression}\\n\\n\"\n{id(node)}[label={label}]")
-        self.__generate_dot_recursive(node, out)
-        out.write("}")
-        #print(f"Dot File generated: {filename}.dot")
-        self.__reset_draw(self.root)
-
-    def __generate_dot_recursive(self, node: BDDNode, out):
-        if not node.drawn:
-            # draw negative_child child node
-            if node.negative_child is not None:
-                alt_str = "_" if node.negative_child.is_alt else ""
-                child_node = node.negative_child
-                #get probabilities
-                prob_str = ""
-                if node.negative_probability is not None:
-                    for prob in node.negative_probability:
-                        if prob.variable is not None:
-                            prob_str = " " + prob_str + (prob.variable if not prob.is_alt else prob.variable + "_") + " "
-                        prob_str = prob_str + f"{float(node.negative_probability[prob]):.2f}"
-                        prob_str = prob_str + "\\n"
-                if child_node.variable is not None:
-                    #draw child node
-                    assignments = "\n".join(str(d) for d in child_node.assignments)
-                    out.write(f"{id(child_node)}[label=\"{child_node.variable + alt_str}\n{assignments}\"]\n")
-                    #draw edge node -> child_node
-                    out.write(f"{id(node)} -> {id(child_node)}[style=dashed label=\"{prob_str}\" fontcolor = gray]\n")
-                    self.__generate_dot_recursive(child_node, out)
-                elif node.negative_child.value is not None:
-                    #draw leaf node
-                    assignments = "\n".join(str(d) for d in child_node.assignments)
-                    out.write(f"{id(child_node)}[label=\"{child_node.value}\n{assignments}\"]\n")
-                    #draw edge node -> leaf node
-                    out.write(f"{id(node)} -> {id(child_node)}[style=dashed label=\"{prob_str}\" fontcolor = gray]\n")
-            #draw positive childnode
-            if node.positive_child is not None:
-                child_node = node.positive_child
-                alt_str = "_" if node.positive_child.is_alt else ""
-                #get probability
-                prob_str = ""
-                if node.positive_probability is not None:
-                    for prob in node.positive_probability:
-                        if prob.variable is not None:
-                            prob_str = " " + prob_str + (prob.variable if not prob.is_alt else prob.variable + "_") + " "
-                        prob_str = prob_str + f"{float(node.positive_probability[prob]):.2f}"
-                        prob_str = prob_str + "\\n"
-                if child_node.variable is not None:
-                    #draw child node
-                    assignments = "\n".join(str(d) for d in child_node.assignments)
-                    out.write(f"{id(child_node)}[label=\"{child_node.variable + alt_str}\n{assignments}\"]\n")
-                    #draw edge node -> child node
-                    out.write(f"{id(node)} -> {id(child_node)} [label=\"{prob_str}\" fontcolor = gray]\n")
-                    self.__generate_dot_recursive(child_node, out)
-                elif child_node.value is not None:
-                    #draw leaf node 
-                    assignments = "\n".join(str(d) for d in child_node.assignments)
-                    out.write(f"{id(child_node)}[label=\"{child_node.value}\n{assignments}\"]\n")
-                    #draw edge node -> leaf node
-                    out.write(f"{id(node)} -> {id(child_node)} [label=\"{prob_str}\" fontcolor = gray]\n")
-            node.drawn = True
-
-    def __reset_draw(self, node):
-        if node.isLeaf():
-            node.drawn = False
-        if node.negative_child is not None:
-            self.__reset_draw(node.negative_child)
-        if node.positive_child is not None:
-            self.__reset_draw(node.positive_child)
-        node.drawn = False
+    #writes out/<path>.dot on the background writer of tracing.py, nothing is written at TraceLevel.OFF
+    #at most max_nodes nodes are written, see export.py
+    def generateDot(self, path="output", trace_level: Optional[TraceLevel] = None, max_nodes: Optional[int] = None):
+        self.__trace(path, "dot", trace_level, max_nodes)
+
+    #same as generateDot in the compact node/edge format of export.to_json
+    def generateJson(self, path="output", trace_level: Optional[TraceLevel] = None, max_nodes: Optional[int] = None):
+        self.__trace(path, "json", trace_level, max_nodes)
+
+    def __trace(self, path, format, trace_level, max_nodes):
+        trace_level = self.trace_level if trace_level is None else trace_level
+        if trace_level == TraceLevel.OFF:
+            return
+        import export
+        with instrumentation.phase("generateDot"):
+            content = export.render(self, format, trace_level == TraceLevel.FULL,
+                                    export.MAX_NODES if max_nodes is None else max_nodes)
+            tracing.get_writer().write(export.output_path(path, format), content)
 
     def __eq__(self, other):
         if other is None or not isinstance(other, BDD):
@@ -604,6 +839,7 @@ def evaluate_expression(expr, assignment):
 
 
 def main():
+    from gmpy2 import mpq
     #Example:
     # e = "(A and B) or C"
     # e = "((not A or B) and (not B or A)) and ((not C or D) and (not D or C))"
@@ -0,0 +1,247 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from gmpy2 import mpq
+from bdd import BDD
+from threshold import count_expression
+
+PHASES = ["build", "reduce", "unite", "set_probabilities", "sum"]
+FAMILIES = ["cnf", "dnf", "threshold", "chain", "ladder"]
+
+
+def variable_names(n: int, prefix: str = "x") -> list[str]:
+    return [f"{prefix}{i}" for i in range(1, n + 1)]
+
+
+# every variable in a generated expression is followed by a space, rename_variables relies on that
+def literal(var: str, positive: bool) -> str:
+    return f"{var} " if positive else f"not {var} "
+
+
+def random_clauses(variables: list[str], count: int, width: int, rng: random.Random) -> list[list[str]]:
+    width = min(width, len(variables))
+    clauses = []
+    for _ in range(count):
+        chosen = sorted(rng.sample(variables, width), key=variables.index)
+        clauses.append([literal(var, rng.random() < 0.5) for var in chosen])
+    return clauses
+
+
+def random_cnf(variables: list[str], count: int, width: int, rng: random.Random) -> str:
+    clauses = random_clauses(variables, count, width, rng)
+    return " and ".join("(" + " or ".join(c) + ")" for c in clauses)
+
+
+def random_dnf(variables: list[str], count: int, width: int, rng: random.Random) -> str:
+    terms = random_clauses(variables, count, width, rng)
+    return " or ".join("(" + " and ".join(t) + ")" for t in terms)
+
+
+# at least k of the variables are set (minSize logic of _old/Case.py)
+def threshold_expression(variables: list[str], k: int) -> str:
+    return count_expression(variables, f">= {k}")
+
+
+# (x1 or x2) and (x2 or x3) and ... -> width of the reduced BDD stays constant
+def chain_expression(variables: list[str]) -> str:
+    if len(variables) == 1:
+        return f"{variables[0]} "
+    return " and ".join(f"({a} or {b} )" for a, b in zip(variables, variables[1:]))
+
+
+# (x1 and x(m+1)) or (x2 and x(m+2)) or ... -> exponential in the given order
+def ladder_expression(variables: list[str]) -> str:
+    m = len(variables) // 2
+    if m == 0:
+        return f"{variables[0]} "
+    return " or ".join(f"({variables[i]} and {variables[i + m]} )" for i in range(m))
+
+
+def guard_expression(family: str, variables: list[str], rng: random.Random) -> str:
+    n = len(variables)
+    if family == "cnf":
+        return random_cnf(variables, count=n, width=3, rng=rng)
+    if family == "dnf":
+        return random_dnf(variables, count=n, width=3, rng=rng)
+    if family == "threshold":
+        return threshold_expression(variables, k=(n + 1) // 2)
+    if family == "chain":
+        return chain_expression(variables)
+    if family == "ladder":
+        return ladder_expression(variables)
+    raise Exception(f"unknown family {family}")
+
+
+# random 2x2 tables (see set_probabilities for the layout) with exact entries that sum to 1
+def random_probabilities(variables: list[str], rng: random.Random) -> dict[str, list[mpq]]:
+    p = {}
+    for var in variables:
+        weights = [rng.randint(1, 20) for _ in range(4)]
+        total = sum(weights)
+        p[var] = [mpq(w, total) for w in weights]
+    return p
+
+
+# runs the phases of Model.calc_tp_fp for the fp diagram, without writing dot files
+def run_phases(f_guard: str, unobservable: str, probabilities: dict[str, list[mpq]], timer) -> dict:
+    variables = list(probabilities.keys())
+    nodes = {}
+    with timer("build"):
+        bdd_f = BDD(f_guard, variables)
+        bdd_uo = BDD(unobservable, variables)
+    nodes["f_unreduced"] = bdd_f.node_count()
+    with timer("reduce"):
+        bdd_f.reduce()
+        bdd_uo.reduce()
+    nodes["f"] = bdd_f.node_count()
+    nodes["uo"] = bdd_uo.node_count()
+    with timer("unite"):
+        bdd_f_replaced = bdd_f.rename_variables()
+        bdd_not_f = bdd_f.negate()
+        bdd_not_uo = bdd_uo.negate()
+        united_vars = [v for var in variables for v in (var, var + "_")]
+        bdd_fp = BDD.unite(bdd_f_replaced, BDD.unite(bdd_not_f, bdd_not_uo, variables), united_vars)
+    nodes["fp"] = bdd_fp.node_count()
+    with timer("set_probabilities"):
+        bdd_fp.set_probabilities(probabilities)
+    with timer("sum"):
+        fp = bdd_fp.sum_probabilities_positive_cases()
+    return {"nodes": nodes, "fp": float(fp)}
+
+
+class PhaseTimer:
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.seconds = {}
+        self.peak_bytes = {}
+        self.__current = None
+        self.__start = 0.0
+
+    def __call__(self, phase: str):
+        self.__current = phase
+        return self
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.__start
+        self.seconds[self.__current] = self.seconds.get(self.__current, 0.0) + elapsed
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peak_bytes[self.__current] = max(peak, self.peak_bytes.get(self.__current, 0))
+        return False
+
+
+def bench_case(family: str, n: int, seed: int, repeat: int) -> dict:
+    rng = random.Random(f"{family}-{n}-{seed}")
+    variables = variable_names(n)
+    f_guard = guard_expression(family, variables, rng)
+    unobservable = random_dnf(variables, count=max(1, n // 2), width=2, rng=rng)
+    probabilities = random_probabilities(variables, rng)
+
+    #timing runs without tracemalloc, it slows allocations down considerably
+    best = {}
+    result = None
+    for _ in range(repeat):
+        timer = PhaseTimer(trace_memory=False)
+        result = run_phases(f_guard, unobservable, probabilities, timer)
+        for phase, seconds in timer.seconds.items():
+            best[phase] = min(seconds, best.get(phase, seconds))
+
+    timer = PhaseTimer(trace_memory=True)
+    tracemalloc.start()
+    try:
+        run_phases(f_guard, unobservable, probabilities, timer)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": f"{family}/{n}",
+        "family": family,
+        "n": n,
+        "seed": seed,
+        "seconds": {phase: best[phase] for phase in PHASES},
+        "total_seconds": sum(best.values()),
+        "peak_bytes": {phase: timer.peak_bytes[phase] for phase in PHASES},
+        "nodes": result["nodes"],
+        "fp": result["fp"],
+    }
+
+
+def run_benchmarks(families: list[str], sizes: list[int], seed: int = 0, repeat: int = 3, verbose=True) -> dict:
+    results = []
+    for family in families:
+        for n in sizes:
+            case = bench_case(family, n, seed, repeat)
+            if verbose:
+                print(f"{case['name']:>14}: {case['total_seconds']:.4f}s, "
+                      f"peak {max(case['peak_bytes'].values()) / 1024:.0f} KiB, fp nodes {case['nodes']['fp']}")
+            results.append(case)
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+# returns the cases whose total time grew by more than the tolerance factor compared to the baseline
+# and by more than min_seconds, small cases take a few milliseconds and their noise alone exceeds the factor
+def find_regressions(baseline: dict, current: dict, tolerance: float,
+                     min_seconds: float = 0.01) -> list[tuple[str, float, float]]:
+    old = {case["name"]: case for case in baseline["results"]}
+    regressions = []
+    for case in current["results"]:
+        if case["name"] not in old:
+            continue
+        before = old[case["name"]]["total_seconds"]
+        after = case["total_seconds"]
+        if before > 0 and after > before * tolerance and after - before > min_seconds:
+            regressions.append((case["name"], before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Times the phases of the tp/fp computation on generated models.")
+    parser.add_argument("--families", nargs="+", default=FAMILIES, choices=FAMILIES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[3, 5, 7, 9])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor for --compare")
+    parser.add_argument("--min-seconds", type=float, default=0.01,
+                        help="slowdowns up to this many seconds are noise for --compare")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.families, args.sizes, args.seed, args.repeat)
+    with open(args.output, "w") as out:
+        json.dump(results, out, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(baseline, results, args.tolerance, args.min_seconds)
+        for name, before, after in regressions:
+            print(f"Regression in {name}: {before:.4f}s -> {after:.4f}s")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
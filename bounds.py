@@ -0,0 +1,109 @@
+import math
+from gmpy2 import mpq
+from frozen import FrozenBDD
+
+# interval arithmetic on non negative floats, lower bounds are rounded down and upper bounds up
+# by one step to the next float, so the exact value always stays inside the interval
+
+
+def _down(x: float) -> float:
+    return max(0.0, math.nextafter(x, -math.inf))
+
+
+def _up(x: float) -> float:
+    return math.nextafter(x, math.inf)
+
+
+# smallest interval of floats containing the exact value p
+def interval(p) -> tuple[float, float]:
+    value = float(p)
+    exact = mpq(value)
+    lower = value if exact <= p else _down(value)
+    upper = value if exact >= p else _up(value)
+    return lower, upper
+
+
+def _add(a: tuple[float, float], b: tuple[float, float]) -> tuple[float, float]:
+    return _down(a[0] + b[0]), _up(a[1] + b[1])
+
+
+def _mul(a: tuple[float, float], b: tuple[float, float]) -> tuple[float, float]:
+    return _down(a[0] * b[0]), _up(a[1] * b[1])
+
+
+def _div(a: tuple[float, float], b: tuple[float, float]) -> tuple[float, float]:
+    if b[0] == 0.0:
+        return 0.0, 1.0  #probabilities never exceed 1
+    return _down(a[0] / b[1]), min(1.0, _up(a[1] / b[0]))
+
+
+class BoundedVerdict:
+    def __init__(self, acceptable: bool, lower: float, upper: float, exact=None, visited: int = 0):
+        self.acceptable = acceptable  #fp < threshold
+        self.lower = lower  #fp lies in [lower, upper]
+        self.upper = upper
+        self.exact = exact  #exact fp if the bounds were too close to the threshold, otherwise None
+        self.visited = visited  #nodes processed before the verdict was known
+
+    def __repr__(self):
+        return (f"BoundedVerdict(acceptable={self.acceptable}, fp in [{self.lower:.6g}, {self.upper:.6g}], "
+                f"exact={'-' if self.exact is None else float(self.exact)}, visited={self.visited})")
+
+
+# decides fp < threshold for the fp diagram without summing it exactly
+# the probability mass is pushed from the root to the leafs, nodes in order of their level; the mass that reached
+# the True leaf is a lower bound of fp, adding the mass still waiting at unprocessed nodes gives an upper bound
+# alt nodes x_ get their mass per context (reached from x = 0, x = 1 or from another variable) like in
+# FrozenBDD.weighted_count; the exact sum is only calculated if the final interval contains the threshold
+def bounded_acceptable(bdd: FrozenBDD, probabilities: dict[str, list], threshold: float) -> BoundedVerdict:
+    if bdd.root <= bdd.TRUE:
+        fp = float(bdd.root == bdd.TRUE)
+        return BoundedVerdict(fp < threshold, fp, fp)
+    tables = {var: [interval(p) for p in table] for var, table in probabilities.items()}
+    #table variable and whether the level is an alt variable
+    levels = [(var[:-1] if alt else var, alt) for var, alt in zip(bdd.variables, bdd.alt)]
+
+    #mass[i][context] with context None, 0 or 1, see above
+    mass = {bdd.root: {None: (1.0, 1.0)}}
+    found = (0.0, 0.0)
+    pending = 1.0  #upper bound of the mass waiting at nodes in mass
+    visited = 0
+    #internal nodes are numbered by level, so parents are processed before their children
+    for i in range(bdd.root, len(bdd.level)):
+        contexts = mass.pop(i, None)
+        if contexts is None:
+            continue
+        visited += 1
+        var, alt = levels[bdd.level[i]]
+        t = tables[var]
+        for context, m in contexts.items():
+            # x'\x     0        1
+            # 0    [0] p00  [1] p10
+            # 1    [2] p01  [3] p11
+            if not alt:
+                branches = (_add(t[0], t[2]), _add(t[1], t[3]))
+            elif context is None:
+                branches = (_add(t[0], t[1]), _add(t[2], t[3]))
+            else:
+                total = _add(t[context], t[context + 2])
+                branches = (_div(t[context], total), _div(t[context + 2], total))
+            pending = _up(pending - m[0])
+            for bit, child in ((0, bdd.negative[i]), (1, bdd.positive[i])):
+                child_mass = _mul(m, branches[bit])
+                if child <= bdd.TRUE:
+                    if child == bdd.TRUE:
+                        found = _add(found, child_mass)
+                    continue
+                child_var, child_alt = levels[bdd.level[child]]
+                child_context = bit if child_alt and not alt and child_var == var else None
+                child_contexts = mass.setdefault(child, {})
+                child_contexts[child_context] = _add(child_contexts.get(child_context, (0.0, 0.0)), child_mass)
+                pending = _up(pending + child_mass[1])
+        upper = _up(found[1] + pending)
+        if upper < threshold:
+            return BoundedVerdict(True, found[0], upper, visited=visited)
+        if found[0] >= threshold:
+            return BoundedVerdict(False, found[0], upper, visited=visited)
+    #the interval contains the threshold, only the exact value decides
+    exact = bdd.weighted_count(probabilities)
+    return BoundedVerdict(exact < threshold, found[0], found[1], exact, visited)
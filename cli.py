@@ -0,0 +1,162 @@
+import argparse
+import hashlib
+import json
+import os
+from fractions import Fraction
+
+# command line entry point, e.g.
+#   python cli.py tp-fp model.json --backend float
+#   python cli.py acceptable model.json --bounded --cache .cache
+#   python cli.py algorithm model.json --batched --trace summary
+#   python cli.py batch configs.json --output results.jsonl --workers 4
+# a model file is one configuration as in batch.py:
+# {"threshold": 0.05, "f_guard": ..., "unobservable": ..., "probabilities": {var: [p00, p10, p01, p11]}}
+# the guards are expressions, {"dimacs": path} (relative to the model file) or JSON expression trees (see loaders.py)
+# the results are printed as one JSON object
+#
+# only the standard library is imported here, the BDD modules (and with them gmpy2 and NumPy) are imported by the
+# command that needs them, so --help and answers from the cache don't pay for them
+
+COMMANDS = ("tp-fp", "acceptable", "algorithm", "batch")
+BACKENDS = ("exact", "float")
+TRACE_LEVELS = ("off", "summary", "full")
+
+
+def read_model(path: str) -> dict:
+    with open(path) as file:
+        config = json.load(file)
+    missing = {"threshold", "f_guard", "unobservable", "probabilities"} - config.keys()
+    if missing:
+        raise Exception(f"model file {path} misses {sorted(missing)}")
+    return config
+
+
+# variables of the model in the given order, order is a comma separated permutation of the variables or None
+def variable_order(config: dict, order: str = None) -> list[str]:
+    variables = list(config["probabilities"])
+    if order is None:
+        return variables
+    ordered = [var.strip() for var in order.split(",")]
+    if sorted(ordered) != sorted(variables):
+        raise Exception(f"order {ordered} is not a permutation of the variables {variables}")
+    return ordered
+
+
+# exact values need gmpy2, the float backend reads the tables as floats and doesn't import it
+def parse_probabilities(probabilities: dict, variables: list[str], backend: str) -> dict:
+    if backend == "exact":
+        from gmpy2 import mpq
+        return {var: [mpq(p) for p in probabilities[var]] for var in variables}
+    return {var: [float(Fraction(str(p))) for p in probabilities[var]] for var in variables}
+
+
+def _guard(guard, variables: list[str], config: dict, directory: str):
+    if isinstance(guard, str):
+        return guard
+    import loaders
+    if "dimacs" in guard:
+        #DIMACS variable i is the i-th variable of the file
+        if variables != list(config["probabilities"]):
+            raise Exception("DIMACS guards can't be reordered with --order")
+        return loaders.load_dimacs(os.path.join(directory, guard["dimacs"]), variables)
+    return loaders.tree_bdd(guard, variables)
+
+
+def build_model(config: dict, args, directory: str = ""):
+    from model import Model
+    from tracing import TraceLevel
+    variables = variable_order(config, args.order)
+    return Model(float(config["threshold"]), _guard(config["unobservable"], variables, config, directory),
+                 _guard(config["f_guard"], variables, config, directory),
+                 parse_probabilities(config["probabilities"], variables, args.backend),
+                 trace_level=TraceLevel[args.trace.upper()], parallel_workers=args.workers, backend=args.backend)
+
+
+# results are cached per command, model, contents of the DIMACS files it refers to and options that change them,
+# as <cache>/<sha256>.json
+def _cache_path(args, config: dict) -> str:
+    options = {key: getattr(args, key) for key in ("command", "backend", "order", "bounded", "batched",
+                                                   "stop_when_acceptable") if hasattr(args, key)}
+    files = {}
+    for guard in (config["f_guard"], config["unobservable"]):
+        if isinstance(guard, dict) and "dimacs" in guard:
+            with open(os.path.join(os.path.dirname(args.model), guard["dimacs"]), "rb") as file:
+                files[guard["dimacs"]] = hashlib.sha256(file.read()).hexdigest()
+    key = json.dumps({"model": config, "files": files, "options": options}, sort_keys=True)
+    return os.path.join(args.cache, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+
+def run(args) -> dict:
+    config = read_model(args.model)
+    cache_path = _cache_path(args, config) if args.cache else None
+    if cache_path is not None and os.path.isfile(cache_path):
+        with open(cache_path) as file:
+            return json.load(file)
+    with build_model(config, args, os.path.dirname(args.model)) as model:
+        #dot files go to out/<name of the model file>/ when tracing
+        path = os.path.splitext(os.path.basename(args.model))[0]
+        if args.command == "tp-fp":
+            tp, fp = model.calc_tp_fp(path)
+            result = {"tp": float(tp), "fp": float(fp)}
+        elif args.command == "acceptable" and args.bounded:
+            verdict = model.check_acceptable_bounded()
+            result = {"acceptable": verdict.acceptable, "fp_lower": verdict.lower, "fp_upper": verdict.upper}
+        elif args.command == "acceptable":
+            fp = model.calc_tp_fp(path)[1]
+            result = {"acceptable": model.check_acceptable(fp), "fp": float(fp)}
+        else:
+            r = model.algorithm(path, verbose=args.verbose, batched=args.batched,
+                                stop_when_acceptable=args.stop_when_acceptable)
+            result = {"tp_initial": float(r.tp_initial), "fp_initial": float(r.fp_initial),
+                      "tp_final": float(r.tp_final), "fp_final": float(r.fp_final), "acceptable": r.acceptable,
+                      "iterations": r.iterations}
+    import tracing
+    tracing.get_writer().flush()
+    if cache_path is not None:
+        os.makedirs(args.cache, exist_ok=True)
+        with open(cache_path, "w") as file:
+            json.dump(result, file)
+    return result
+
+
+def parser() -> argparse.ArgumentParser:
+    main_parser = argparse.ArgumentParser(description="tp/fp of guards and their reduction by Model.algorithm")
+    commands = main_parser.add_subparsers(dest="command", required=True)
+    model_options = argparse.ArgumentParser(add_help=False)
+    model_options.add_argument("model", help="JSON model file")
+    model_options.add_argument("--backend", choices=BACKENDS, default="exact",
+                               help="exact sums with gmpy2 or float sums with NumPy")
+    model_options.add_argument("--order", default=None,
+                               help="variable order as comma separated names, the order of the file by default")
+    model_options.add_argument("--trace", choices=TRACE_LEVELS, default="off", help="dot files written to out/")
+    model_options.add_argument("--workers", type=int, default=0,
+                               help="processes for the products of calc_tp_fp, 0 works in this process")
+    model_options.add_argument("--cache", default=None, help="directory for cached results")
+
+    commands.add_parser("tp-fp", parents=[model_options], help="tp and fp of the guard")
+    acceptable = commands.add_parser("acceptable", parents=[model_options], help="whether fp is below the threshold")
+    acceptable.add_argument("--bounded", action="store_true", help="decide with bounds on fp, see bounds.py")
+    algorithm = commands.add_parser("algorithm", parents=[model_options], help="run Model.algorithm")
+    algorithm.add_argument("--batched", action="store_true", help="reduce once per round, see Model.algorithm")
+    algorithm.add_argument("--stop-when-acceptable", action="store_true")
+    algorithm.add_argument("--verbose", action="store_true", help="print the values of every step")
+    batch = commands.add_parser("batch", help="run Model.algorithm for many configurations, see batch.py")
+    batch.add_argument("configs", help="JSON or CSV file with the configurations")
+    batch.add_argument("--output", default="batch_results.jsonl")
+    batch.add_argument("--workers", type=int, default=None, help="worker processes, all cores by default")
+    return main_parser
+
+
+def main(argv=None) -> int:
+    args = parser().parse_args(argv)
+    if args.command == "batch":
+        import batch
+        failed = batch.run_batch(batch.read_configs(args.configs), args.output, args.workers)
+        print(json.dumps({"output": args.output, "failed": failed}))
+        return 1 if failed else 0
+    print(json.dumps(run(args)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
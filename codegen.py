@@ -0,0 +1,83 @@
+from typing import Callable
+from bdd import BDD, BDDNode, variable_name
+
+STYLES = ("ifelse", "bitmask")
+#diagrams whose expanded decision tree is larger get a helper function for every shared node
+INLINE_LIMIT = 2000
+#Python limits the indentation depth, nodes on every NESTING_LIMIT-th level get a helper function
+NESTING_LIMIT = 64
+
+
+# generates the source of a function evaluating the BDD
+# ifelse:  guard(v0, v1, ...) takes one value per variable in the order of bdd.variables
+# bitmask: guard(m) takes an int whose bit i is the value of variable i
+def generate_source(bdd: BDD, style: str = "ifelse", name: str = "guard") -> str:
+    if style not in STYLES:
+        raise Exception(f"unknown style {style}, expected one of {STYLES}")
+    levels = bdd.variable_levels()
+    n = len(bdd.variables)
+    nodes = bdd.nodes_bottom_up()
+
+    #size of the decision tree below each node if everything was inlined
+    sizes = {}
+    parents = {}
+    for node in nodes:
+        if node.isLeaf():
+            sizes[id(node)] = 1
+            continue
+        sizes[id(node)] = 1 + sizes[id(node.negative_child)] + sizes[id(node.positive_child)]
+        for child in (node.negative_child, node.positive_child):
+            parents[id(child)] = parents.get(id(child), 0) + 1
+    inline_all = sizes[id(bdd.root)] <= INLINE_LIMIT
+    helpers = {}
+    for i, node in enumerate(nodes):
+        if node.isLeaf():
+            continue
+        shared = not inline_all and parents.get(id(node), 0) > 1
+        if shared or levels[variable_name(node)] % NESTING_LIMIT == NESTING_LIMIT - 1:
+            helpers[id(node)] = f"_n{i}"
+
+    #helpers get the values as one tuple instead of one argument per variable
+    if style == "bitmask":
+        parameters = arguments = "m"
+    elif helpers:
+        parameters = "*v"
+        arguments = "v"
+    else:
+        parameters = arguments = ", ".join(f"v{i}" for i in range(n))
+
+    def condition(node: BDDNode) -> str:
+        level = levels[variable_name(node)]
+        if style == "bitmask":
+            return f"m & {1 << level}"
+        return f"v[{level}]" if helpers else f"v{level}"
+
+    def body(node: BDDNode, indent: str, lines: list[str], top: bool):
+        if node.isLeaf():
+            lines.append(f"{indent}return {bool(node.value)}")
+        elif id(node) in helpers and not top:
+            lines.append(f"{indent}return {helpers[id(node)]}({arguments})")
+        else:
+            lines.append(f"{indent}if {condition(node)}:")
+            body(node.positive_child, indent + "    ", lines, False)
+            lines.append(f"{indent}else:")
+            body(node.negative_child, indent + "    ", lines, False)
+
+    lines = []
+    #helpers are defined bottom up, so every helper only calls helpers defined before it
+    for node in nodes:
+        if id(node) in helpers:
+            lines.append(f"def {helpers[id(node)]}({arguments}):")
+            body(node, "    ", lines, True)
+    lines.append(f"def {name}({parameters}):")
+    body(bdd.root, "    ", lines, id(bdd.root) in helpers)
+    return "\n".join(lines) + "\n"
+
+
+def compile_bdd(bdd: BDD, style: str = "ifelse") -> Callable[..., bool]:
+    source = generate_source(bdd, style)
+    namespace = {}
+    exec(compile(source, f"<bdd {bdd.expression[:40]}>", "exec"), namespace)
+    guard = namespace["guard"]
+    guard.source = source
+    return guard
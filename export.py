@@ -0,0 +1,111 @@
+import json
+import os
+from collections import deque
+from bdd import BDD, BDDNode, variable_name
+
+#nodes written per diagram, larger diagrams are cut off breadth first from the root
+MAX_NODES = 10_000
+#assignments listed per node at TraceLevel.FULL
+MAX_ASSIGNMENTS = 8
+FORMATS = ("dot", "json")
+#directory the traces are written to
+OUTPUT_DIRECTORY = "out"
+
+
+# <OUTPUT_DIRECTORY>/<path>.<format>, path may use / or \ as separator
+def output_path(path: str, format: str = "dot") -> str:
+    parts = [part for part in path.replace("\\", "/").split("/") if part]
+    return os.path.join(OUTPUT_DIRECTORY, *parts) + "." + format
+
+
+# the first max_nodes nodes in breadth first order from the root, numbered in that order
+# the numbers replace id() as node names, so the output is the same in every run
+def numbered_nodes(bdd: BDD, max_nodes: int = MAX_NODES) -> tuple[list[BDDNode], dict[int, int], bool]:
+    nodes = []
+    index = {id(bdd.root): 0}
+    queue = deque([bdd.root])
+    truncated = False
+    while queue:
+        node = queue.popleft()
+        nodes.append(node)
+        if node.isLeaf():
+            continue
+        for child in (node.negative_child, node.positive_child):
+            if id(child) in index:
+                continue
+            if len(index) >= max_nodes:
+                truncated = True
+                continue
+            index[id(child)] = len(index)
+            queue.append(child)
+    return nodes, index, truncated
+
+
+def _label(node: BDDNode) -> str:
+    return str(node.value) if node.isLeaf() else variable_name(node)
+
+
+def _assignments(node: BDDNode, max_assignments: int) -> list[str]:
+    lines = [str(a) for a in node.assignments[:max_assignments]]
+    if len(node.assignments) > max_assignments:
+        lines.append(f"... {len(node.assignments) - max_assignments} more")
+    return lines
+
+
+# probabilities of an edge, one per parent of the node the edge starts at
+def _edge_probabilities(probabilities: dict) -> list[tuple[str, float]]:
+    return [(_label(parent), float(p)) for parent, p in probabilities.items()]
+
+
+def to_dot(bdd: BDD, full: bool = False, max_nodes: int = MAX_NODES, max_assignments: int = MAX_ASSIGNMENTS) -> str:
+    nodes, index, truncated = numbered_nodes(bdd, max_nodes)
+    title = bdd.expression + (f"\\n(first {len(nodes)} nodes)" if truncated else "")
+    lines = [f"digraph{{\nlabel=\"{title}\\n\\n\""]
+    for node in nodes:
+        label = "\n".join([_label(node)] + (_assignments(node, max_assignments) if full else []))
+        lines.append(f"n{index[id(node)]}[label=\"{label}\"]")
+    for node in nodes:
+        if node.isLeaf():
+            continue
+        for child, probabilities, style in ((node.negative_child, node.negative_probability, "style=dashed "),
+                                            (node.positive_child, node.positive_probability, "")):
+            if id(child) not in index:
+                continue
+            prob_str = "".join(f" {parent} {p:.2f}\\n" for parent, p in _edge_probabilities(probabilities))
+            lines.append(f"n{index[id(node)]} -> n{index[id(child)]}[{style}label=\"{prob_str}\" fontcolor = gray]")
+    lines.append("}")
+    return "\n".join(lines)
+
+
+# compact node/edge format:
+# nodes: label per node (variable name, "_" for alt variables, or "True"/"False" for leafs), the root is node 0
+# edges: [source, target, value of the variable, [[parent label, probability], ...]]
+def to_json(bdd: BDD, full: bool = False, max_nodes: int = MAX_NODES, max_assignments: int = MAX_ASSIGNMENTS) -> str:
+    nodes, index, truncated = numbered_nodes(bdd, max_nodes)
+    edges = []
+    for node in nodes:
+        if node.isLeaf():
+            continue
+        for bit, child, probabilities in ((0, node.negative_child, node.negative_probability),
+                                          (1, node.positive_child, node.positive_probability)):
+            if id(child) in index:
+                edges.append([index[id(node)], index[id(child)], bit, _edge_probabilities(probabilities)])
+    graph = {
+        "expression": bdd.expression,
+        "variables": list(bdd.variables),
+        "nodes": [_label(node) for node in nodes],
+        "edges": edges,
+        "truncated": truncated,
+    }
+    if full:
+        graph["assignments"] = [_assignments(node, max_assignments) for node in nodes]
+    return json.dumps(graph, separators=(",", ":"))
+
+
+def render(bdd: BDD, format: str = "dot", full: bool = False, max_nodes: int = MAX_NODES,
+           max_assignments: int = MAX_ASSIGNMENTS) -> str:
+    if format == "dot":
+        return to_dot(bdd, full, max_nodes, max_assignments)
+    if format == "json":
+        return to_json(bdd, full, max_nodes, max_assignments)
+    raise Exception(f"unknown format {format}, expected one of {FORMATS}")
@@ -0,0 +1,109 @@
+import numpy as np
+from gmpy2 import mpq
+from bdd import BDD, BDDNode
+from vectorized import ArrayBDD
+
+
+# read only snapshot of a BDD, safe to share between threads without locks
+# nodes are stored in the tuples of the ArrayBDD layout (0 = False, 1 = True, internal nodes sorted by level),
+# later changes of the BDD (reduce, set_probabilities, Model.algorithm) don't affect the snapshot
+class FrozenBDD:
+    FALSE = ArrayBDD.FALSE
+    TRUE = ArrayBDD.TRUE
+    __slots__ = ("variables", "expression", "root", "level", "negative", "positive", "alt", "_arrays")
+
+    def __init__(self, bdd: BDD):
+        arrays = ArrayBDD(bdd)
+        arrays.freeze()
+        set_field = super().__setattr__
+        set_field("variables", tuple(bdd.variables))
+        set_field("expression", bdd.expression)
+        set_field("root", arrays.root)
+        set_field("level", tuple(arrays.level.tolist()))
+        set_field("negative", tuple(arrays.negative.tolist()))
+        set_field("positive", tuple(arrays.positive.tolist()))
+        set_field("alt", tuple(arrays.alt.tolist()))
+        set_field("_arrays", arrays)
+
+    def __setattr__(self, name, value):
+        raise Exception("FrozenBDD can't be changed, create a new snapshot with BDD.freeze")
+
+    def __len__(self):
+        return len(self.level)
+
+    # value of the function for one observation, given as one value per variable
+    def evaluate(self, observation) -> bool:
+        i = self.root
+        while i > self.TRUE:
+            i = self.positive[i] if observation[self.level[i]] else self.negative[i]
+        return i == self.TRUE
+
+    # see ArrayBDD.evaluate
+    def evaluate_batch(self, observations: np.ndarray) -> np.ndarray:
+        return self._arrays.evaluate(observations)
+
+    # weighted_count in floating point, see ArrayBDD.weighted_count
+    def weighted_count_float(self, probabilities: dict[str, list], dtype=np.float64) -> float:
+        return self._arrays.weighted_count(probabilities, dtype)
+
+    # variable of the probability table for a level, "x" for both x and x_
+    def __table_variable(self, level: int) -> str:
+        var = self.variables[level]
+        return var[:-1] if self.alt[level] else var
+
+    # probability of the True leaf for the 2x2 tables of the variables, the same value as
+    # set_probabilities + sum_probabilities_positive_cases of the BDD, computed bottom up in one pass
+    # an alt node x_ directly below a node testing x is weighted with P(x'|x), otherwise with P(x')
+    def weighted_count(self, probabilities: dict[str, list]):
+        # x'\x     0        1
+        # 0    [0] p00  [1] p10
+        # 1    [2] p01  [3] p11
+        if self.root <= self.TRUE:
+            return mpq(int(self.root == self.TRUE))
+        #same number type as the tables, mpq or float
+        zero = 0 * probabilities[self.__table_variable(self.level[self.root])][0]
+        one = zero + 1
+        size = len(self.level)
+        #value[i]: probability of reaching True from node i, conditional[b][i]: same for alt nodes given x = b
+        value = [zero, one] + [zero] * (size - 2)
+        conditional = ([zero, one] + [zero] * (size - 2), [zero, one] + [zero] * (size - 2))
+        for i in range(size - 1, self.TRUE, -1):
+            level = self.level[i]
+            table = probabilities[self.__table_variable(level)]
+            if not self.alt[level]:
+                p_negative = table[0] + table[2]
+                p_positive = table[1] + table[3]
+                value[i] = (p_negative * self.__child_value(value, conditional, level, self.negative[i], 0)
+                            + p_positive * self.__child_value(value, conditional, level, self.positive[i], 1))
+                continue
+            negative = value[self.negative[i]]
+            positive = value[self.positive[i]]
+            value[i] = (table[0] + table[1]) * negative + (table[2] + table[3]) * positive
+            for bit, (p_not_perceived, p_perceived) in enumerate(((table[0], table[2]), (table[1], table[3]))):
+                total = p_not_perceived + p_perceived
+                if total:
+                    conditional[bit][i] = (p_not_perceived * negative + p_perceived * positive) / total
+        return value[self.root]
+
+    def __child_value(self, value, conditional, level: int, child: int, bit: int):
+        if child > self.TRUE:
+            child_level = self.level[child]
+            if self.alt[child_level] and self.__table_variable(child_level) == self.variables[level]:
+                return conditional[bit][child]
+        return value[child]
+
+    # new BDD with the nodes of the snapshot, e.g. for export.py or as input of unite
+    def to_bdd(self) -> BDD:
+        bdd = BDD(self.expression, list(self.variables), build_new=False)
+        nodes = [bdd.leafs[False], bdd.leafs[True]] + [None] * (len(self.level) - 2)
+        for i in range(len(self.level) - 1, self.TRUE, -1):
+            level = self.level[i]
+            nodes[i] = BDDNode(var=self.__table_variable(level), is_alt=self.alt[level],
+                               negative_child=nodes[self.negative[i]], positive_child=nodes[self.positive[i]])
+        bdd.root = nodes[self.root]
+        return bdd
+
+    # see export.render
+    def export(self, format: str = "dot", max_nodes: int = None) -> str:
+        import export
+        return export.render(self.to_bdd(), format, max_nodes=export.MAX_NODES if max_nodes is None else max_nodes)
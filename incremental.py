@@ -0,0 +1,124 @@
+from bdd import BDD, BDDNode
+
+# tp and fp of Model.algorithm after every change of f without building the products again
+# fp = f_ and not f and not uo and tp = f_ and f and not uo over the interleaved variables [x, x_, y, y_, ...] like
+# in Model.calc_tp_fp, here as indices of one hash consed store that lives as long as the IncrementalTpFp object:
+# f and f_ are imported again after every change, the parts of f that didn't change get the indices they had before,
+# so the computed tables of the products and the weights of the nodes (as in FrozenBDD.weighted_count) still hold
+# for them and only the pairs below the redirected f nodes are computed again; not uo is imported once
+
+
+class IncrementalTpFp:
+    FALSE = 0
+    TRUE = 1
+
+    # backend: "exact" sums the tables as given, "float" converts them to floats first (like BDD.weighted_count)
+    def __init__(self, not_uo: BDD, variables: list[str], probabilities: dict[str, list], backend: str = "exact"):
+        if backend not in ("exact", "float"):
+            raise Exception(f"unknown backend {backend}, expected exact or float")
+        self.variables = list(variables)
+        self.levels = {var: 2 * i for i, var in enumerate(self.variables)}
+        #one table per variable, the level of x is 2i and the level of x_ is 2i + 1
+        self.tables = [[float(p) for p in probabilities[var]] if backend == "float" else list(probabilities[var])
+                       for var in self.variables]
+        zero = 0 * self.tables[0][0] if self.tables else 0
+        #nodes are (level, low, high), the leafs are on level 2 * len(variables)
+        self.level = [2 * len(self.variables)] * 2
+        self.low = [None, None]
+        self.high = [None, None]
+        self.unique = {}
+        self.and_computed = {}
+        self.not_computed = {}
+        #value[i]: probability of reaching True from node i, conditional[b][i]: same for x_ nodes below x = b
+        self.value = {self.FALSE: zero, self.TRUE: zero + 1}
+        self.conditional = ({}, {})
+        self.not_uo = self.import_bdd(not_uo)
+
+    def __len__(self):
+        return len(self.level)
+
+    def node(self, level: int, low: int, high: int) -> int:
+        if low == high:
+            return low
+        key = (level, low, high)
+        index = self.unique.get(key)
+        if index is None:
+            index = self.unique[key] = len(self.level)
+            self.level.append(level)
+            self.low.append(low)
+            self.high.append(high)
+        return index
+
+    # index of the BDD in the store, over x (alt=False) or x_ (alt=True) for the variables x of the BDD
+    def import_bdd(self, bdd: BDD, alt: bool = False) -> int:
+        imported = {}
+
+        def import_node(node: BDDNode) -> int:
+            if node.isLeaf():
+                return self.TRUE if node.value else self.FALSE
+            if id(node) not in imported:
+                imported[id(node)] = self.node(self.levels[node.variable] + alt, import_node(node.negative_child),
+                                               import_node(node.positive_child))
+            return imported[id(node)]
+        return import_node(bdd.root)
+
+    def negate(self, a: int) -> int:
+        if a <= self.TRUE:
+            return 1 - a
+        if a not in self.not_computed:
+            self.not_computed[a] = self.node(self.level[a], self.negate(self.low[a]), self.negate(self.high[a]))
+        return self.not_computed[a]
+
+    def conjunction(self, a: int, b: int) -> int:
+        if a == self.FALSE or b == self.FALSE:
+            return self.FALSE
+        if a == self.TRUE or a == b:
+            return b
+        if b == self.TRUE:
+            return a
+        key = (a, b) if a < b else (b, a)
+        result = self.and_computed.get(key)
+        if result is None:
+            level = min(self.level[a], self.level[b])
+            a_low, a_high = (self.low[a], self.high[a]) if self.level[a] == level else (a, a)
+            b_low, b_high = (self.low[b], self.high[b]) if self.level[b] == level else (b, b)
+            result = self.and_computed[key] = self.node(level, self.conjunction(a_low, b_low),
+                                                        self.conjunction(a_high, b_high))
+        return result
+
+    # probability of the True leaf for node i, the same bottom up sum as FrozenBDD.weighted_count
+    def weight(self, i: int):
+        # x'\x     0        1
+        # 0    [0] p00  [1] p10
+        # 1    [2] p01  [3] p11
+        if i in self.value:
+            return self.value[i]
+        level = self.level[i]
+        table = self.tables[level // 2]
+        if level % 2 == 0:
+            self.value[i] = ((table[0] + table[2]) * self.__child_weight(level, self.low[i], 0)
+                             + (table[1] + table[3]) * self.__child_weight(level, self.high[i], 1))
+            return self.value[i]
+        negative = self.weight(self.low[i])
+        positive = self.weight(self.high[i])
+        self.value[i] = (table[0] + table[1]) * negative + (table[2] + table[3]) * positive
+        for bit, (p_not_perceived, p_perceived) in enumerate(((table[0], table[2]), (table[1], table[3]))):
+            total = p_not_perceived + p_perceived
+            self.conditional[bit][i] = ((p_not_perceived * negative + p_perceived * positive) / total if total
+                                        else self.value[self.FALSE])
+        return self.value[i]
+
+    #an x_ node directly below x is weighted with P(x'|x)
+    def __child_weight(self, level: int, child: int, bit: int):
+        value = self.weight(child)
+        if child > self.TRUE and self.level[child] == level + 1:
+            return self.conditional[bit][child]
+        return value
+
+    # (tp, fp) for the current f
+    def tp_fp(self, f: BDD) -> tuple:
+        f_index = self.import_bdd(f)
+        f_replaced = self.import_bdd(f, alt=True)
+        tp = self.conjunction(f_replaced, self.conjunction(self.not_uo, f_index))
+        fp = self.conjunction(f_replaced, self.conjunction(self.negate(f_index), self.not_uo))
+        return self.weight(tp), self.weight(fp)
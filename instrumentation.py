@@ -0,0 +1,93 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# active recorder, None while instrumentation is disabled
+_recorder: Optional["Recorder"] = None
+
+
+class Recorder:
+    def __init__(self):
+        self.phases = {}  # phase name -> {"calls": int, "seconds": float}
+        self.counters = {}  # counter name -> int
+        self.samples = {}  # sample name -> list of recorded values
+
+    def add_time(self, name: str, seconds: float):
+        entry = self.phases.setdefault(name, {"calls": 0, "seconds": 0.0})
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def sample(self, name: str, value):
+        self.samples.setdefault(name, []).append(value)
+
+    def to_dict(self) -> dict:
+        return {"phases": self.phases, "counters": self.counters, "samples": self.samples}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+class _Phase:
+    def __init__(self, recorder: Recorder, name: str):
+        self.recorder = recorder
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+#times the with-block as the given phase, returns a shared no-op context while disabled
+def phase(name: str):
+    if _recorder is None:
+        return _NO_PHASE
+    return _Phase(_recorder, name)
+
+
+def count(name: str, n: int = 1):
+    if _recorder is not None:
+        _recorder.count(name, n)
+
+
+def sample(name: str, value):
+    if _recorder is not None:
+        _recorder.sample(name, value)
+
+
+#enables instrumentation for the with-block, the recorder is handed to callback when the block is left
+@contextmanager
+def instrument(callback: Optional[Callable[[Recorder], None]] = None, recorder: Optional[Recorder] = None):
+    global _recorder
+    previous = _recorder
+    _recorder = Recorder() if recorder is None else recorder
+    active = _recorder
+    try:
+        yield active
+    finally:
+        _recorder = previous
+        if callback is not None:
+            callback(active)
@@ -0,0 +1,165 @@
+import itertools
+import json
+from typing import Iterable, Iterator, Optional
+from bdd import BDD, BDDNode
+
+# builds BDDs for guards given as CNF (DIMACS) or as JSON expression trees without evaluating one large
+# expression over all 2^n assignments: every clause (subtree) gets its own small BDD, they are combined with
+# BDD.apply in a balanced order, so the intermediate BDDs stay small
+#
+# JSON expression trees:
+# {"variables": ["a", "b", "c"],
+#  "expression": {"op": "and", "args": [{"var": "a"}, {"op": "not", "args": [{"op": "or", "args": [...]}]}]}}
+# op is one of and, or, not; leafs are {"var": name} or {"const": true/false}
+
+
+# BDD of a constant function over variables
+def constant_bdd(value: bool, variables: list[str]) -> BDD:
+    bdd = BDD(str(value), variables, build_new=False)
+    bdd.root = bdd.leafs[value]
+    return bdd
+
+
+# BDD of the single variable var
+def variable_bdd(var: str, variables: list[str]) -> BDD:
+    bdd = BDD(var + " ", variables, build_new=False)
+    bdd.root = BDDNode(var=var, negative_child=bdd.leafs[False], positive_child=bdd.leafs[True])
+    return bdd
+
+
+# BDD of a clause (disjunction of literals), literals are (variable, positive), built as a chain without apply
+def clause_bdd(literals: Iterable[tuple[str, bool]], variables: list[str]) -> BDD:
+    levels = {var: i for i, var in enumerate(variables)}
+    polarity = {}
+    for var, positive in literals:
+        if var not in levels:
+            raise Exception(f"variable {var} of the clause not in {variables}")
+        if polarity.get(var, positive) != positive:
+            #x or not x
+            return constant_bdd(True, variables)
+        polarity[var] = positive
+    if not polarity:
+        return constant_bdd(False, variables)
+    #every variable is followed by a space for rename_variables, like in threshold.count_expression
+    expression = "(" + " or ".join((var if positive else "not " + var) + " " for var, positive in polarity.items()) + ")"
+    bdd = BDD(expression, variables, build_new=False)
+    #built from the last variable up, a literal that holds ends in True, otherwise the next literal decides
+    node = bdd.leafs[False]
+    for var in sorted(polarity, key=levels.get, reverse=True):
+        satisfied = bdd.leafs[True]
+        if polarity[var]:
+            node = BDDNode(var=var, negative_child=node, positive_child=satisfied)
+        else:
+            node = BDDNode(var=var, negative_child=satisfied, positive_child=node)
+    bdd.root = node
+    return bdd
+
+
+# combines the BDDs with the operator of BDD.apply like a binary counter: the stack holds at most one BDD per
+# rank, a BDD of rank r combines 2^r inputs; every input takes part in O(log n) applies and BDDs of similar size
+# are combined with each other instead of adding one small BDD at a time to an ever growing one
+def balanced_apply(bdds: Iterable[BDD], variables: list[str], operator: str = "and") -> BDD:
+    stack: list[tuple[int, BDD]] = []
+    for bdd in bdds:
+        rank = 0
+        while stack and stack[-1][0] == rank:
+            _, other = stack.pop()
+            bdd = BDD.apply(other, bdd, variables, operator)
+            rank += 1
+        stack.append((rank, bdd))
+    if not stack:
+        return constant_bdd(operator == "and", variables)
+    _, result = stack.pop()
+    while stack:
+        _, other = stack.pop()
+        result = BDD.apply(other, result, variables, operator)
+    return result
+
+
+# clauses of a DIMACS CNF file as lists of literals (positive or negative variable numbers), read line by line
+def read_dimacs(lines: Iterable[str]) -> Iterator[list[int]]:
+    clause = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith("%"):
+            #end marker of the SATLIB files
+            break
+        if not line or line[0] in "cp":
+            continue
+        for token in line.split():
+            literal = int(token)
+            if literal == 0:
+                yield clause
+                clause = []
+            else:
+                clause.append(literal)
+    if clause:
+        yield clause
+
+
+# number of variables from the "p cnf <variables> <clauses>" line
+def dimacs_variable_count(path: str) -> int:
+    with open(path) as file:
+        for line in file:
+            if line.startswith("p"):
+                return int(line.split()[2])
+    raise Exception(f"{path} has no 'p cnf' line")
+
+
+# BDD of a DIMACS CNF file, variable i is named prefix + str(i) unless variables are given
+# the clauses are read as a stream; within each window of window clauses they are conjoined in the order of their
+# first and last variable, so clauses over neighbouring variables are combined first while at most window clauses
+# are held; window = 0 conjoins them in the order of the file
+def load_dimacs(path: str, variables: Optional[list[str]] = None, prefix: str = "x", window: int = 1024) -> BDD:
+    if variables is None:
+        variables = [f"{prefix}{i}" for i in range(1, dimacs_variable_count(path) + 1)]
+    with open(path) as file:
+        clauses = read_dimacs(file)
+        if window:
+            clauses = _clustered(clauses, window)
+        bdds = (clause_bdd(((variables[abs(literal) - 1], literal > 0) for literal in clause), variables)
+                for clause in clauses)
+        return balanced_apply(bdds, variables, "and")
+
+
+def _clustered(clauses: Iterator[list[int]], window: int) -> Iterator[list[int]]:
+    for chunk in iter(lambda: list(itertools.islice(clauses, window)), []):
+        yield from sorted(chunk, key=lambda c: (min(map(abs, c), default=0), max(map(abs, c), default=0)))
+
+
+def tree_bdd(tree: dict, variables: list[str]) -> BDD:
+    if "var" in tree:
+        if tree["var"] not in variables:
+            raise Exception(f"variable {tree['var']} not in {variables}")
+        return variable_bdd(tree["var"], variables)
+    if "const" in tree:
+        return constant_bdd(bool(tree["const"]), variables)
+    op = tree.get("op")
+    args = tree.get("args", [])
+    if op == "not":
+        if len(args) != 1:
+            raise Exception(f"not takes one argument, got {len(args)}")
+        return tree_bdd(args[0], variables).negate()
+    literals = [_literal(arg) for arg in args] if op == "or" else []
+    if literals and None not in literals:
+        #clause, built directly
+        return clause_bdd(literals, variables)
+    if op in ("and", "or"):
+        return balanced_apply((tree_bdd(arg, variables) for arg in args), variables, op)
+    raise Exception(f"unknown node {tree}, expected op and, or, not or a var or const leaf")
+
+
+# (variable, positive) if the tree is a variable or a negated variable, otherwise None
+def _literal(tree: dict) -> Optional[tuple[str, bool]]:
+    if "var" in tree:
+        return tree["var"], True
+    if tree.get("op") == "not" and len(tree.get("args", [])) == 1 and "var" in tree["args"][0]:
+        return tree["args"][0]["var"], False
+    return None
+
+
+# BDD of a JSON expression tree file, see the format above
+def load_json_tree(path: str) -> BDD:
+    with open(path) as file:
+        data = json.load(file)
+    return tree_bdd(data["expression"], list(data["variables"]))
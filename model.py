@@ -1,30 +1,131 @@
+from __future__ import annotations
+import os
+from typing import TYPE_CHECKING
 from bdd import BDD, BDDNode, delete_all_files_from_out
-from gmpy2 import mpq
+import instrumentation
+import tracing
+from tracing import TraceLevel
+
+#gmpy2 and the modules using NumPy are imported where they are needed, importing model stays cheap
+if TYPE_CHECKING:
+    from gmpy2 import mpq
+    import sampling
+    import bounds
+    import add
+
+
+class AlgorithmResult:
+    def __init__(self, tp_initial, fp_initial, tp_final, fp_final, acceptable: bool, iterations: int,
+                 trajectory: list[tuple] = None):
+        self.tp_initial = tp_initial
+        self.fp_initial = fp_initial
+        self.tp_final = tp_final
+        self.fp_final = fp_final
+        self.acceptable = acceptable  #check_acceptable of the final fp
+        self.iterations = iterations
+        #(tp, fp) before the first and after every iteration if tracked, otherwise only the initial and final values
+        self.trajectory = [(tp_initial, fp_initial), (tp_final, fp_final)] if trajectory is None else trajectory
+
+    def __repr__(self):
+        return (f"AlgorithmResult(tp {float(self.tp_initial):.4f} -> {float(self.tp_final):.4f}, "
+                f"fp {float(self.fp_initial):.4f} -> {float(self.fp_final):.4f}, acceptable={self.acceptable})")
 
 
 class Model:
+    #unobservable and f_guard are either expressions or BDDs over the variables of probabilities in the same order,
+    #e.g. built with the functions of threshold.py
+    #closed_form: use the binomial formulas of symmetric.py when all tables are equal and f and uo are symmetric
+    #build_bdds: False skips the diagrams for guards that are too large, only sample_tp_fp can be used then
+    #trace_level: dot files written by calc_tp_fp and algorithm, none by default
+    #parallel_workers: processes for the fp and tp products of calc_tp_fp (see parallel.unite), 0 unites in this process
+    #the process pool is started on first use and reused until close (or the end of a with block)
+    #backend: "exact" sums fp and tp in the number type of the tables, "float" with the NumPy kernel of vectorized.py
     def __init__(self, acceptable_threshold: float,
-                 unobservable: str,
-                 f_guard: str,
-                 probabilities: dict[str, list[mpq]]):
+                 unobservable: str | BDD,
+                 f_guard: str | BDD,
+                 probabilities: dict[str, list[mpq]],
+                 closed_form: bool = True,
+                 build_bdds: bool = True,
+                 trace_level: TraceLevel = TraceLevel.OFF,
+                 parallel_workers: int = 0,
+                 backend: str = "exact"):
         self.acceptable_threshold = acceptable_threshold
-        self.uo = BDD(unobservable, list(probabilities.keys()))
-        self.uo.reduce()
-        self.f = BDD(f_guard, list(probabilities.keys()))
-        self.f.reduce()
+        self.trace_level = trace_level
+        self.parallel_workers = parallel_workers
+        self.backend = backend
+        self.closed_form = closed_form
+        self.unobservable_expression = unobservable.expression if isinstance(unobservable, BDD) else unobservable
+        self.f_expression = f_guard.expression if isinstance(f_guard, BDD) else f_guard
+        self.uo = None
+        self.f = None
+        if build_bdds:
+            self.uo = self.__guard_bdd(unobservable, list(probabilities.keys()))
+            self.f = self.__guard_bdd(f_guard, list(probabilities.keys()))
         self.vars = list(probabilities.keys())
         self.probabilities = probabilities
+        #parts of calc_tp_fp that only depend on uo, algorithm doesn't change uo
+        self.__uo_derived = {}
+        self.__pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    #shuts down the process pool of parallel_workers, a later calc_tp_fp starts a new one
+    def close(self):
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+    @staticmethod
+    def __guard_bdd(guard: str | BDD, variables: list[str]) -> BDD:
+        if isinstance(guard, BDD):
+            if list(guard.variables) != variables:
+                raise Exception(f"variables of the guard {guard.variables} don't match {variables}")
+            #algorithm modifies f, the given BDD stays untouched
+            bdd = guard.copy_bdd()
+        else:
+            bdd = BDD(guard, variables)
+        bdd.reduce()
+        return bdd
 
     def calc_tp_fp(self, path: str, step=""):
-        self.f.generateDot(f"{path}\\{step}0_bdd_f_")
+        with instrumentation.phase("calc_tp_fp"):
+            if self.closed_form:
+                result = self.closed_form_tp_fp()
+                if result is not None:
+                    return result
+            return self.__calc_tp_fp(path, step)
+
+    #tp and fp without building the fp/tp diagrams, None if the model is not symmetric
+    def closed_form_tp_fp(self):
+        import symmetric
+        table = symmetric.identical_table(self.probabilities)
+        if table is None:
+            return None
+        f_profile = symmetric.symmetric_profile(self.f)
+        if f_profile is None:
+            return None
+        if "profile" not in self.__uo_derived:
+            self.__uo_derived["profile"] = symmetric.symmetric_profile(self.uo)
+        uo_profile = self.__uo_derived["profile"]
+        if uo_profile is None:
+            return None
+        instrumentation.count("calc_tp_fp.closed_form")
+        return symmetric.closed_form_tp_fp(len(self.vars), table, f_profile, uo_profile)
+
+    def __calc_tp_fp(self, path: str, step):
+        self.f.generateDot(os.path.join(path, f"{step}0_bdd_f_"), self.trace_level)
         bdd_f_replaced = self.f.rename_variables()
-        bdd_f_replaced.generateDot(f"{path}\\{step}1_bdd_f_replaced")
+        bdd_f_replaced.generateDot(os.path.join(path, f"{step}1_bdd_f_replaced"), self.trace_level)
 
         bdd_not_f = self.f.negate()
-        bdd_not_f.generateDot(f"{path}\\{step}2_bdd_not_f")
+        bdd_not_f.generateDot(os.path.join(path, f"{step}2_bdd_not_f"), self.trace_level)
 
-        bdd_not_uo = self.uo.negate()
-        bdd_not_uo.generateDot(f"{path}\\{step}3_bdd_not_uo")
+        bdd_not_uo = self.__not_uo()
+        bdd_not_uo.generateDot(os.path.join(path, f"{step}3_bdd_not_uo"), self.trace_level)
 
         if bdd_not_f.variables != bdd_not_uo.variables:
             raise Exception("variables of f and uo don't match")
@@ -38,86 +139,247 @@ class Model:
 
         #build fp = f_ and not f and not uo
         first_unite = BDD.unite(bdd_not_f, bdd_not_uo, not_f_vars)
-        bdd_fp = BDD.unite(bdd_f_replaced, first_unite, f_united_vars)
-        bdd_fp.set_probabilities(self.probabilities)
-        bdd_fp.generateDot(f"{path}\\{step}5_bdd_fp")
-        fp = bdd_fp.sum_probabilities_positive_cases()
+        bdd_fp = self.__unite_product(bdd_f_replaced, first_unite, f_united_vars)
+        fp = self.__weighted_sum(bdd_fp, os.path.join(path, f"{step}5_bdd_fp"))
 
         #build tp = f_ and f and not uo
-        bdd_tp = BDD.unite(bdd_f_replaced, BDD.unite(bdd_not_uo, self.f, self.vars), f_united_vars)
-        bdd_tp.set_probabilities(self.probabilities)
-        bdd_tp.generateDot(f"{path}\\{step}6_bdd_tp")
-        tp = bdd_tp.sum_probabilities_positive_cases()
+        bdd_tp = self.__unite_product(bdd_f_replaced, BDD.unite(bdd_not_uo, self.f, self.vars), f_united_vars)
+        tp = self.__weighted_sum(bdd_tp, os.path.join(path, f"{step}6_bdd_tp"))
         #bdd_tp.sum_all_probability_paths()
 
         return tp, fp
 
+    def __not_uo(self) -> BDD:
+        if "not_uo" not in self.__uo_derived:
+            self.__uo_derived["not_uo"] = self.uo.negate()
+        return self.__uo_derived["not_uo"]
+
+    #fp = f_ and not f and not uo, like in calc_tp_fp
+    def __fp_bdd(self) -> BDD:
+        united_vars = [v for var in self.vars for v in (var, var + "_")]
+        not_f_not_uo = BDD.unite(self.f.negate(), self.__not_uo(), self.vars)
+        return self.__unite_product(self.f.rename_variables(), not_f_not_uo, united_vars)
+
+    #tp = f_ and f and not uo, like in calc_tp_fp
+    def __tp_bdd(self) -> BDD:
+        united_vars = [v for var in self.vars for v in (var, var + "_")]
+        return self.__unite_product(self.f.rename_variables(), BDD.unite(self.__not_uo(), self.f, self.vars),
+                                    united_vars)
+
+    #tp and fp for every value of x and x_ of the free sensors at once: an ADD whose leafs are (tp, fp) given these
+    #values, the other variables are summed out with their tables, see add.py
+    def symbolic_tp_fp(self, free: list[str]) -> add.ADD:
+        import add
+        with instrumentation.phase("symbolic_tp_fp"):
+            return add.tp_fp_add(self.__tp_bdd().freeze(), self.__fp_bdd().freeze(), self.probabilities, free)
+
+    #probability of the positive cases in one bottom up pass (BDD.weighted_count), the probabilities are only
+    #set on the nodes when the dot file shows them
+    def __weighted_sum(self, bdd: BDD, dot_path: str):
+        if self.trace_level != TraceLevel.OFF:
+            bdd.set_probabilities(self.probabilities)
+            bdd.generateDot(dot_path, self.trace_level)
+        return bdd.weighted_count(self.probabilities, self.backend)
+
+    def __unite_product(self, bdd1: BDD, bdd2: BDD, variable_order: list[str]) -> BDD:
+        if self.parallel_workers:
+            import parallel
+            if self.__pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self.__pool = ProcessPoolExecutor(max_workers=self.parallel_workers)
+            return parallel.unite(bdd1, bdd2, variable_order, workers=self.parallel_workers, pool=self.__pool)
+        return BDD.unite(bdd1, bdd2, variable_order)
+
+    #evaluates the guard f for one observation, given as one value per variable
+    def evaluate(self, observation) -> bool:
+        return self.f.compile()(*observation)
+
+    #evaluates the (possibly reduced by algorithm) guard f for every row of a boolean matrix (samples, variables)
+    def evaluate_batch(self, observations):
+        return self.f.evaluate_batch(observations)
+
+    #Monte Carlo estimate of tp and fp with confidence intervals, see sampling.estimate_tp_fp
+    #uses the diagrams if they were built, they include the changes of algorithm
+    def sample_tp_fp(self, precision: float = 1e-3, confidence: float = 0.95, batch_size: int = 100_000,
+                     max_samples: int = 10_000_000, seed=None) -> sampling.MonteCarloEstimate:
+        import sampling
+        with instrumentation.phase("sample_tp_fp"):
+            if self.f is not None:
+                f = self.f.evaluate_batch
+                uo = self.uo.evaluate_batch
+            else:
+                f = sampling.compile_guard(self.f_expression, self.vars)
+                uo = sampling.compile_guard(self.unobservable_expression, self.vars)
+            return sampling.estimate_tp_fp(f, uo, self.probabilities, precision, confidence, batch_size, max_samples,
+                                           seed)
+
     def check_acceptable(self, fp: float):
         return fp < self.acceptable_threshold
 
+    #check_acceptable without the exact fp: bounds on fp are refined until they are on one side of the threshold,
+    #fp is only calculated exactly when it is too close to the threshold, see bounds.bounded_acceptable
+    def check_acceptable_bounded(self) -> bounds.BoundedVerdict:
+        import bounds
+        with instrumentation.phase("check_acceptable_bounded"):
+            if self.closed_form:
+                result = self.closed_form_tp_fp()
+                if result is not None:
+                    fp = result[1]
+                    return bounds.BoundedVerdict(self.check_acceptable(fp), float(fp), float(fp), fp)
+            return bounds.bounded_acceptable(self.__fp_bdd().freeze(), self.probabilities, self.acceptable_threshold)
+
     def find_node_in_uo(self, bdd_uo: BDD) -> BDDNode:
-        nodes = bdd_uo.breadth_first_bottom_up_search()
-        while nodes:
-            n = nodes.pop(0)
-            if n.isLeaf() or n == bdd_uo.root:
+        with instrumentation.phase("find_node_in_uo"):
+            nodes = self.__reducible_uo_nodes(bdd_uo, first_only=True)
+            return nodes[0] if nodes else None
+
+    #all nodes find_node_in_uo can return, found in one pass
+    def find_nodes_in_uo(self, bdd_uo: BDD) -> list[BDDNode]:
+        with instrumentation.phase("find_node_in_uo"):
+            return self.__reducible_uo_nodes(bdd_uo, first_only=False)
+
+    #nodes below the root whose children are leafs with different values
+    @staticmethod
+    def __reducible_uo_nodes(bdd_uo: BDD, first_only: bool) -> list[BDDNode]:
+        found = []
+        for n in bdd_uo.breadth_first_bottom_up_search():
+            if n.isLeaf() or n is bdd_uo.root:
                 continue
             if n.negative_child.isLeaf() and n.positive_child.isLeaf():
                 if n.negative_child.value + n.positive_child.value == 1:
-                    return n
+                    found.append(n)
+                    if first_only:
+                        break
+        return found
 
-    def find_node_in_f(self, node_in_uo: BDDNode) -> set[BDDNode]:
-        assignments = node_in_uo.assignments
-        current_node = self.f.root
+    #f nodes reached by the paths to node_in_uo, f_index: see f_index
+    #without f_index f is walked along the assignments of node_in_uo, which only diagrams built from an expression have
+    def find_node_in_f(self, node_in_uo: BDDNode, f_index: dict = None) -> set[BDDNode]:
+        if f_index is not None:
+            return set(f_index.get(id(node_in_uo), []))
         found_nodes = set()
-        for assignment in assignments:
-            for var in assignment:
-                if current_node.variable != var:
-                    continue
-                if assignment[var]:
-                    current_node = current_node.positive_child
-                else:
-                    current_node = current_node.negative_child
+        for assignment in node_in_uo.assignments:
+            current_node = self.f.root
+            for var, value in assignment.items():
+                #variables f doesn't test on this path are skipped
+                if current_node.variable == var:
+                    current_node = current_node.positive_child if value else current_node.negative_child
             found_nodes.add(current_node)
         return found_nodes
 
+    #id of every node of bdd_uo -> the f nodes its paths lead to, i.e. the first f node at or below its level on
+    #every assignment of the variables above it; found by walking uo and f together, every (uo node, f node) pair
+    #is visited once, so it takes O(|uo| * |f|) instead of enumerating the assignments; only valid until f or
+    #bdd_uo is changed
+    def f_index(self, bdd_uo: BDD) -> dict[int, list[BDDNode]]:
+        levels = {var: i for i, var in enumerate(self.vars)}
+
+        def level(node: BDDNode) -> int:
+            return len(self.vars) if node.isLeaf() else levels[node.variable]
+
+        index = {}
+        visited = set()
+        stack = [(bdd_uo.root, self.f.root)]
+        while stack:
+            uo_node, f_node = stack.pop()
+            if (id(uo_node), id(f_node)) in visited:
+                continue
+            visited.add((id(uo_node), id(f_node)))
+            uo_level, f_level = level(uo_node), level(f_node)
+            if f_level < uo_level:
+                #uo doesn't test the variable of f_node on this path, both values reach uo_node
+                stack += [(uo_node, f_node.negative_child), (uo_node, f_node.positive_child)]
+                continue
+            found = index.setdefault(id(uo_node), {})
+            found[id(f_node)] = f_node
+            if uo_node.isLeaf():
+                continue
+            if uo_level == f_level:
+                stack += [(uo_node.negative_child, f_node.negative_child),
+                          (uo_node.positive_child, f_node.positive_child)]
+            else:
+                stack += [(uo_node.negative_child, f_node), (uo_node.positive_child, f_node)]
+        return {key: list(found.values()) for key, found in index.items()}
+
     #TODO: rename this
-    def algorithm(self, path: str):
+    #verbose: print the values, returns them in an AlgorithmResult either way
+    #batched: handle all nodes of find_nodes_in_uo per round and reduce once per round instead of once per node,
+    #the f nodes of a round are all looked up before any of its changes, while the sequential mode looks up the f
+    #nodes of a uo node after the changes (and reductions) for the nodes before it, so the final f, tp and fp can
+    #differ from the sequential mode (see TestAlgorithm.test_batched_differs), not only the number of iterations
+    #track: calculate tp and fp after every iteration, they are returned in AlgorithmResult.trajectory
+    #the values are maintained incrementally by an IncrementalTpFp (see incremental.py): the products and weights of
+    #the parts of f that an iteration doesn't change are reused, only the ones below the redirected f nodes are
+    #computed again; with tracing the products are written as dot files, so every iteration runs calc_tp_fp instead;
+    #the values of the last iteration are the final ones, they are not calculated again at the end
+    #stop_when_acceptable: stop (and track) as soon as check_acceptable holds for fp
+    def algorithm(self, path: str, verbose: bool = True, batched: bool = False, track: bool = False,
+                  stop_when_acceptable: bool = False) -> AlgorithmResult:
+        track = track or stop_when_acceptable
         bdd_uo_copy = self.uo.rename_variables()
         #1
         tp_old, fp_old = self.calc_tp_fp(path, "_start_")
-        print(
-            f"\033[96m\n\033[1m{path}:\033[0m\nInitial values: \ntp: " + f"{float(tp_old):.2f}" + "\nfp: " +
-            f"{float(fp_old):.2f}")
+        if verbose:
+            print(
+                f"\033[96m\n\033[1m{path}:\033[0m\nInitial values: \ntp: " + f"{float(tp_old):.2f}" + "\nfp: " +
+                f"{float(fp_old):.2f}")
+        trajectory = [(tp_old, fp_old)]
+        tracker = None
         #2
-        child_uo = self.find_node_in_uo(bdd_uo_copy)
         i = 1
-        while child_uo:
+        while not (stop_when_acceptable and self.check_acceptable(trajectory[-1][1])):
+            children_uo = self.find_nodes_in_uo(bdd_uo_copy) if batched else [self.find_node_in_uo(bdd_uo_copy)]
+            if not children_uo or children_uo[0] is None:
+                break
+            instrumentation.count("algorithm.iterations")
             #a
-            children_f = self.find_node_in_f(child_uo)
+            f_index = self.f_index(bdd_uo_copy)
+            children_f = {}
+            for child_uo in children_uo:
+                for child in self.find_node_in_f(child_uo, f_index):
+                    children_f[id(child)] = child
             #b
-            for child in children_f:
+            for child in children_f.values():
                 child.positive_child = child.negative_child
+            self.f.invalidate()
             #c
-            child_uo.positive_child = child_uo.negative_child
+            for child_uo in children_uo:
+                child_uo.positive_child = child_uo.negative_child
+            bdd_uo_copy.invalidate()
             #d
             self.f.reduce()
-            self.f.generateDot(f"{path}\\bdd_f_" + str(i))
+            self.f.generateDot(os.path.join(path, f"bdd_f_{i}"), self.trace_level)
             bdd_uo_copy.reduce()
-            bdd_uo_copy.generateDot(f"{path}\\bdd_uo_" + str(i))
+            bdd_uo_copy.generateDot(os.path.join(path, f"bdd_uo_{i}"), self.trace_level)
+            if track and self.trace_level != TraceLevel.OFF:
+                trajectory.append(self.calc_tp_fp(path, f"{i}_"))
+            elif track:
+                with instrumentation.phase("incremental_tp_fp"):
+                    if tracker is None:
+                        from incremental import IncrementalTpFp
+                        tracker = IncrementalTpFp(self.__not_uo(), self.vars, self.probabilities, self.backend)
+                    trajectory.append(tracker.tp_fp(self.f))
+            if track and verbose:
+                print(f"Iteration {i}: tp: {float(trajectory[-1][0]):.2f} fp: {float(trajectory[-1][1]):.2f}")
             i += 1
-            child_uo = self.find_node_in_uo(bdd_uo_copy)
         #3
-        tp_new, fp_new = self.calc_tp_fp(path, "end_")
-        print("New values: \ntp: " + f"{float(tp_new):.2f}" + "\nfp: " + f"{float(fp_new):.2f}")
+        #the values after the last iteration are already known when tracking
+        tp_new, fp_new = trajectory[-1] if track else self.calc_tp_fp(path, "end_")
+        if verbose:
+            print("New values: \ntp: " + f"{float(tp_new):.2f}" + "\nfp: " + f"{float(fp_new):.2f}")
         #4
         is_acceptable = self.check_acceptable(fp_new)
-        print(
-            f"The fp Value ({float(fp_new):.2f}) is {'not ' if not is_acceptable else ''}acceptable. "
-            f"-> {float(fp_new):.2f} "f"{'>' if not is_acceptable else '<='} {self.acceptable_threshold}"
-            "\n---------------------------------\n")
+        if verbose:
+            print(
+                f"The fp Value ({float(fp_new):.2f}) is {'not ' if not is_acceptable else ''}acceptable. "
+                f"-> {float(fp_new):.2f} "f"{'>' if not is_acceptable else '<='} {self.acceptable_threshold}"
+                "\n---------------------------------\n")
+        tracing.get_writer().flush()
+        return AlgorithmResult(tp_old, fp_old, tp_new, fp_new, is_acceptable, i - 1, trajectory if track else None)
 
 
 if __name__ == "__main__":
+    from gmpy2 import mpq
     #Example:
     #vars = ["A1", "A2", "A3"]
     #observations = "(A2 or A3)"
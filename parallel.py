@@ -0,0 +1,128 @@
+import itertools
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional
+from bdd import BDD, BDDNode, variable_name
+import instrumentation
+
+
+# flat form of a BDD for the transfer between processes (pickling nested nodes hits the recursion limit)
+# nodes are listed children first as (variable, is_alt, value, negative index, positive index)
+def serialize(bdd: BDD) -> tuple:
+    nodes = bdd.nodes_bottom_up()
+    index = {id(node): i for i, node in enumerate(nodes)}
+    flat = [(node.variable, node.is_alt, node.value,
+             None if node.isLeaf() else index[id(node.negative_child)],
+             None if node.isLeaf() else index[id(node.positive_child)]) for node in nodes]
+    return bdd.expression, list(bdd.variables), flat, index[id(bdd.root)]
+
+
+def deserialize(data: tuple) -> BDD:
+    expression, variables, flat, root = data
+    bdd = BDD(expression, variables, build_new=False)
+    bdd.root = _load(flat, root, bdd, {})
+    return bdd
+
+
+# builds the nodes of flat in bdd, unique maps (variable, is_alt, id(negative), id(positive)) to the node,
+# so diagrams loaded with the same unique table share their equal subgraphs
+def _load(flat: list[tuple], root: int, bdd: BDD, unique: dict) -> BDDNode:
+    nodes = []
+    for variable, is_alt, value, negative, positive in flat:
+        if variable is None:
+            nodes.append(bdd.leafs[value])
+        else:
+            nodes.append(_node(variable, is_alt, nodes[negative], nodes[positive], unique))
+    return nodes[root]
+
+
+def _node(variable: str, is_alt: bool, negative: BDDNode, positive: BDDNode, unique: dict) -> BDDNode:
+    if negative is positive:
+        return negative
+    key = (variable, is_alt, id(negative), id(positive))
+    if key not in unique:
+        unique[key] = BDDNode(var=variable, is_alt=is_alt, negative_child=negative, positive_child=positive)
+    return unique[key]
+
+
+# node reached from root for the values of the top variables, i.e. the root of the cofactor
+def _cofactor(root: BDDNode, top: dict[str, int], values: tuple[bool, ...]) -> BDDNode:
+    node = root
+    while not node.isLeaf() and variable_name(node) in top:
+        node = node.positive_child if values[top[variable_name(node)]] else node.negative_child
+    return node
+
+
+def _subdiagram(bdd: BDD, root: BDDNode) -> BDD:
+    sub = BDD(bdd.expression, bdd.variables, build_new=False)
+    sub.root = root
+    return sub
+
+
+# runs in the worker processes
+def _unite_serialized(data1: tuple, data2: tuple, variable_order: list[str]) -> tuple:
+    return serialize(BDD.unite(deserialize(data1), deserialize(data2), variable_order))
+
+
+# same result as BDD.unite, the 2^depth cofactors for the values of the first depth variables of variable_order
+# are united in worker processes and merged into one reduced diagram here
+# pool: executor to use, otherwise a process pool with workers processes is created for this call
+def unite(bdd1: BDD, bdd2: BDD, variable_order: list[str], depth: Optional[int] = None,
+          workers: Optional[int] = None, pool: Optional[Executor] = None) -> BDD:
+    for bdd in (bdd1, bdd2):
+        for var in bdd.variables:
+            if var not in variable_order:
+                raise Exception(f"Variable {var} not found in variables.")
+    workers = workers or os.cpu_count()
+    if depth is None:
+        #twice as many jobs as workers, cofactors are rarely of equal size
+        depth = workers.bit_length()
+    depth = min(depth, len(variable_order))
+    if depth == 0:
+        return BDD.unite(bdd1, bdd2, variable_order)
+
+    top = {var: i for i, var in enumerate(variable_order[:depth])}
+    #variable and is_alt of the top variables as used in the nodes
+    names = {}
+    for bdd in (bdd1, bdd2):
+        for node in bdd.breadth_first_bottom_up_search():
+            if not node.isLeaf() and variable_name(node) in top:
+                names[variable_name(node)] = (node.variable, node.is_alt)
+
+    with instrumentation.phase("parallel_unite"):
+        own_pool = pool is None
+        if own_pool:
+            pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            #equal cofactor pairs are only united once
+            jobs = {}
+            cofactors = {}
+            for values in itertools.product((False, True), repeat=depth):
+                pair = (_cofactor(bdd1.root, top, values), _cofactor(bdd2.root, top, values))
+                key = (id(pair[0]), id(pair[1]))
+                cofactors[values] = key
+                if key not in jobs:
+                    jobs[key] = pool.submit(_unite_serialized, serialize(_subdiagram(bdd1, pair[0])),
+                                            serialize(_subdiagram(bdd2, pair[1])), variable_order)
+            instrumentation.count("parallel_unite.jobs", len(jobs))
+            results = {key: job.result() for key, job in jobs.items()}
+        finally:
+            if own_pool:
+                pool.shutdown()
+
+        united_bdd = BDD(expression="(" + bdd1.expression + ")and(" + bdd2.expression + ")",
+                         variables=variable_order, build_new=False)
+        unique = {}
+        roots = {key: _load(result[2], result[3], united_bdd, unique) for key, result in results.items()}
+
+        def merge(values: tuple[bool, ...]) -> BDDNode:
+            if len(values) == depth:
+                return roots[cofactors[values]]
+            negative = merge(values + (False,))
+            positive = merge(values + (True,))
+            variable, is_alt = names.get(variable_order[len(values)], (variable_order[len(values)], False))
+            return _node(variable, is_alt, negative, positive, unique)
+
+        united_bdd.root = merge(())
+    united_bdd.reduce()
+    return united_bdd
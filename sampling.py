@@ -0,0 +1,122 @@
+import ast
+import functools
+import math
+from statistics import NormalDist
+from typing import Callable, Optional
+import numpy as np
+
+
+# rewrites a guard expression so it works on NumPy arrays: and/or/not become element wise operations,
+# operands of arithmetic (e.g. the sums of threshold.py) are converted to integers first
+class _VectorizeGuard(ast.NodeTransformer):
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        function = "_and" if isinstance(node.op, ast.And) else "_or"
+        return ast.Call(func=ast.Name(id=function, ctx=ast.Load()), args=node.values, keywords=[])
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.Call(func=ast.Name(id="_not", ctx=ast.Load()), args=[node.operand], keywords=[])
+        return node
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        node.left = ast.Call(func=ast.Name(id="_int", ctx=ast.Load()), args=[node.left], keywords=[])
+        node.right = ast.Call(func=ast.Name(id="_int", ctx=ast.Load()), args=[node.right], keywords=[])
+        return node
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return ast.Call(func=ast.Name(id="_where", ctx=ast.Load()), args=[node.test, node.body, node.orelse],
+                        keywords=[])
+
+
+_GUARD_FUNCTIONS = {
+    "_and": lambda *args: functools.reduce(np.logical_and, args),
+    "_or": lambda *args: functools.reduce(np.logical_or, args),
+    "_not": np.logical_not,
+    "_int": lambda a: np.asarray(a, dtype=np.int64),
+    "_where": np.where,
+}
+
+
+# compiles a guard expression into a function that evaluates it for every row of a boolean matrix
+# of shape (samples, len(variables)) and returns a boolean array of length samples
+def compile_guard(expression: str, variables: list[str]) -> Callable[[np.ndarray], np.ndarray]:
+    tree = _VectorizeGuard().visit(ast.parse(expression, mode="eval"))
+    code = compile(ast.fix_missing_locations(tree), "<guard>", "eval")
+
+    def guard(observations: np.ndarray) -> np.ndarray:
+        columns = {var: observations[:, i] for i, var in enumerate(variables)}
+        result = eval(code, dict(_GUARD_FUNCTIONS), columns)
+        return np.broadcast_to(np.asarray(result, dtype=bool), (observations.shape[0],))
+
+    return guard
+
+
+# draws ground truth x and perception x' for every variable from its 2x2 table
+# x'\x     0        1
+# 0    [0] p00  [1] p10
+# 1    [2] p01  [3] p11
+# tables that don't sum to 1 are normalized
+def draw_samples(tables: np.ndarray, batch_size: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    cumulative = np.cumsum(tables, axis=1)
+    cumulative = cumulative[:, :3] / cumulative[:, 3:]
+    u = rng.random((batch_size, tables.shape[0]))
+    state = (u >= cumulative[:, 0]).astype(np.int8) + (u >= cumulative[:, 1]) + (u >= cumulative[:, 2])
+    return (state & 1).astype(bool), state >= 2
+
+
+class MonteCarloEstimate:
+    def __init__(self, tp: float, fp: float, tp_interval: tuple[float, float], fp_interval: tuple[float, float],
+                 samples: int, confidence: float, converged: bool):
+        self.tp = tp
+        self.fp = fp
+        self.tp_interval = tp_interval
+        self.fp_interval = fp_interval
+        self.samples = samples
+        self.confidence = confidence
+        self.converged = converged  #False if max_samples was reached before the requested precision
+
+    def __repr__(self):
+        return (f"MonteCarloEstimate(tp={self.tp:.6f} [{self.tp_interval[0]:.6f}, {self.tp_interval[1]:.6f}], "
+                f"fp={self.fp:.6f} [{self.fp_interval[0]:.6f}, {self.fp_interval[1]:.6f}], samples={self.samples})")
+
+
+# Wilson score interval, stays inside [0, 1] for the small fp values we are interested in
+def wilson_interval(hits: int, samples: int, z: float) -> tuple[float, float]:
+    p = hits / samples
+    denominator = 1 + z * z / samples
+    center = (p + z * z / (2 * samples)) / denominator
+    half_width = z / denominator * math.sqrt(p * (1 - p) / samples + z * z / (4 * samples * samples))
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+# estimates tp = P(f(x') and f(x) and not uo(x)) and fp = P(f(x') and not f(x) and not uo(x))
+# sampling stops once both confidence intervals are at most 2 * precision wide or after max_samples
+def estimate_tp_fp(f: Callable[[np.ndarray], np.ndarray], uo: Callable[[np.ndarray], np.ndarray],
+                   probabilities: dict[str, list], precision: float = 1e-3, confidence: float = 0.95,
+                   batch_size: int = 100_000, max_samples: int = 10_000_000,
+                   seed: Optional[int] = None) -> MonteCarloEstimate:
+    tables = np.array([[float(p) for p in table] for table in probabilities.values()], dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    tp_hits = 0
+    fp_hits = 0
+    samples = 0
+    converged = False
+    while samples < max_samples:
+        x, x_perceived = draw_samples(tables, min(batch_size, max_samples - samples), rng)
+        flagged = f(x_perceived) & ~uo(x)
+        truth = f(x)
+        tp_hits += int(np.count_nonzero(flagged & truth))
+        fp_hits += int(np.count_nonzero(flagged & ~truth))
+        samples += x.shape[0]
+        tp_interval = wilson_interval(tp_hits, samples, z)
+        fp_interval = wilson_interval(fp_hits, samples, z)
+        if max(tp_interval[1] - tp_interval[0], fp_interval[1] - fp_interval[0]) <= 2 * precision:
+            converged = True
+            break
+    return MonteCarloEstimate(tp_hits / samples, fp_hits / samples, tp_interval, fp_interval, samples, confidence,
+                              converged)
@@ -0,0 +1,157 @@
+import argparse
+import asyncio
+import json
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Optional
+import numpy as np
+from batch import parse_probabilities
+from model import Model
+
+# requests and responses are JSON objects, one per line
+# {"id": 1, "op": "tp_fp", "config": {...}}                        -> {"id": 1, "result": {"tp": .., "fp": ..}}
+# {"id": 2, "op": "acceptable", "config": {...}}                   -> {"id": 2, "result": {"acceptable": .., ...}}
+# {"id": 3, "op": "evaluate", "config": {...}, "observations": [[true, false, ...], ...]}
+#                                                                  -> {"id": 3, "result": [true, ...]}
+# {"id": 4, "op": "stats"}                                         -> {"id": 4, "result": {...}}
+# config is {"threshold", "f_guard", "unobservable", "probabilities"} as in batch.py, failures give {"id", "error"}
+OPERATIONS = ("tp_fp", "acceptable", "evaluate", "stats")
+
+
+class _Entry:
+    def __init__(self, model: Model):
+        self.model = model
+        self.f = model.f.freeze()  #read only, evaluated by several executor threads at once
+        self.tp_fp = None
+
+
+class ModelServer:
+    # executor: runs the CPU work (building models, calc_tp_fp, evaluation), the default executor of the loop if None
+    # max_models: models kept in memory, the least recently used one is dropped first
+    def __init__(self, executor: Optional[Executor] = None, max_models: int = 128):
+        self.executor = executor
+        self.max_models = max_models
+        self.models: OrderedDict[str, _Entry] = OrderedDict()
+        self.in_flight: dict[tuple, asyncio.Future] = {}
+        self.stats = {"requests": 0, "coalesced": 0, "models_built": 0}
+
+    async def handle_request(self, request: dict) -> dict:
+        self.stats["requests"] += 1
+        response = {"id": request.get("id")}
+        try:
+            response["result"] = await self.__dispatch(request)
+        except Exception as e:
+            response["error"] = f"{type(e).__name__}: {e}"
+        return response
+
+    async def __dispatch(self, request: dict):
+        op = request.get("op")
+        if op not in OPERATIONS:
+            raise Exception(f"unknown op {op}, expected one of {OPERATIONS}")
+        if op == "stats":
+            return dict(self.stats, models=len(self.models))
+        config = request["config"]
+        key = json.dumps(config, sort_keys=True)
+        entry = await self.__entry(key, config)
+        if op == "tp_fp":
+            if entry.tp_fp is None:
+                entry.tp_fp = await self.__coalesce(("tp_fp", key), entry.model.calc_tp_fp, "server")
+            return {"tp": float(entry.tp_fp[0]), "fp": float(entry.tp_fp[1])}
+        if op == "acceptable":
+            if entry.tp_fp is not None:
+                return {"acceptable": entry.model.check_acceptable(entry.tp_fp[1]), "fp": float(entry.tp_fp[1])}
+            verdict = await self.__coalesce(("acceptable", key), entry.model.check_acceptable_bounded)
+            return {"acceptable": verdict.acceptable, "fp_lower": verdict.lower, "fp_upper": verdict.upper}
+        observations = json.dumps(request["observations"])
+        return await self.__coalesce(("evaluate", key, observations), self.__evaluate, entry, request["observations"])
+
+    @staticmethod
+    def __evaluate(entry: _Entry, observations: list) -> list[bool]:
+        n = len(entry.f.variables)
+        array = np.array(observations, dtype=bool)
+        if not (array.ndim == 2 and array.shape[1] == n):
+            raise Exception(f"expected observations as rows of {n} values, got shape {array.shape}")
+        return entry.f.evaluate_batch(array).tolist()
+
+    async def __entry(self, key: str, config: dict) -> _Entry:
+        if key in self.models:
+            self.models.move_to_end(key)
+            return self.models[key]
+        if ("model", key) not in self.in_flight:
+            self.stats["models_built"] += 1
+        entry = await self.__coalesce(("model", key), self.__build, config)
+        if key not in self.models:
+            self.models[key] = entry
+            if len(self.models) > self.max_models:
+                self.models.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def __build(config: dict) -> _Entry:
+        probabilities = parse_probabilities(config["probabilities"])
+        return _Entry(Model(float(config["threshold"]), config["unobservable"], config["f_guard"], probabilities))
+
+    # runs function in the executor, concurrent calls with the same key wait for the same run
+    async def __coalesce(self, key: tuple, function, *args):
+        future = self.in_flight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        #a cancelled request must not cancel the run other requests wait for
+        return await asyncio.shield(future)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        lock = asyncio.Lock()
+
+        async def answer(line: bytes):
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {"id": None, "error": f"invalid request: {e}"}
+            else:
+                response = await self.handle_request(request)
+            async with lock:
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+
+        #requests of one connection are answered concurrently, responses are matched by id
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(answer(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+
+# starts the server on the Unix socket path, or on host:port if no path is given
+async def start_server(server: ModelServer, path: Optional[str] = None, host: str = "127.0.0.1",
+                       port: int = 8765) -> asyncio.AbstractServer:
+    if path is not None:
+        return await asyncio.start_unix_server(server.handle_connection, path=path)
+    return await asyncio.start_server(server.handle_connection, host=host, port=port)
+
+
+async def _serve(args):
+    async with await start_server(ModelServer(max_models=args.max_models), args.socket, args.host, args.port) as s:
+        await s.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="answer tp/fp and evaluation queries from models kept in memory")
+    parser.add_argument("--socket", default=None, help="Unix socket path, otherwise --host and --port are used")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-models", type=int, default=128)
+    args = parser.parse_args(argv)
+    asyncio.run(_serve(args))
+
+
+if __name__ == "__main__":
+    main()
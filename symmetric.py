@@ -0,0 +1,142 @@
+import math
+from typing import Optional
+import numpy as np
+from bdd import BDD, variable_name
+
+
+# returns profile with profile[c] = value of the function for assignments with c positive variables,
+# None if the function is not symmetric, i.e. depends on more than the number of positive variables
+def symmetric_profile(bdd: BDD) -> Optional[list[bool]]:
+    n = len(bdd.variables)
+    levels = {var: i for i, var in enumerate(bdd.variables)}
+
+    def level(node):
+        return n if node.isLeaf() else levels[variable_name(node)]
+
+    if bdd.root.isLeaf():
+        return [bool(bdd.root.value)] * (n + 1)
+
+    #counts of positive variables above each node, for all paths reaching it
+    counts = {id(bdd.root): set(range(level(bdd.root) + 1))}
+    nodes = sorted((node for node in bdd.breadth_first_bottom_up_search() if not node.isLeaf()), key=level)
+    profile = [None] * (n + 1)
+    for node in nodes:
+        for bit, child in ((0, node.negative_child), (1, node.positive_child)):
+            #variables skipped between node and child can take any value
+            skipped = level(child) - level(node) - 1
+            reached = {c + bit + j for c in counts[id(node)] for j in range(skipped + 1)}
+            if not child.isLeaf():
+                counts.setdefault(id(child), set()).update(reached)
+                continue
+            for c in reached:
+                if profile[c] is not None and profile[c] != bool(child.value):
+                    return None
+                profile[c] = bool(child.value)
+    return profile
+
+
+# the shared 2x2 table if all variables have the same one, otherwise None
+def identical_table(probabilities: dict[str, list]) -> Optional[list]:
+    tables = list(probabilities.values())
+    if not tables or any(list(t) != list(tables[0]) for t in tables[1:]):
+        return None
+    return list(tables[0])
+
+
+# tp and fp of a model whose variables share one table and whose f and uo are symmetric,
+# computed from binomial distributions instead of diagrams (cf. _old/Case.py)
+# I = positive ground truth variables, J = positive perceived variables; given I = i,
+# J is the sum of Bin(i, P(x'|x)) and Bin(n - i, P(x'|not x))
+# NumPy floats if the table holds floats, exact arithmetic with mpq otherwise
+def closed_form_tp_fp(n: int, table: list, f_profile: list[bool], uo_profile: list[bool]):
+    if all(isinstance(p, (float, np.floating)) for p in table):
+        return _closed_form_float(n, [float(p) for p in table], f_profile, uo_profile)
+    return _closed_form_exact(n, table, f_profile, uo_profile)
+
+
+# f(J) written as f(0) + sum of steps[t] * [J >= t]
+def _steps(profile: list[bool]) -> list[tuple[int, int]]:
+    return [(t, int(profile[t]) - int(profile[t - 1])) for t in range(1, len(profile)) if profile[t] != profile[t - 1]]
+
+
+def _closed_form_exact(n: int, table: list, f_profile: list[bool], uo_profile: list[bool]):
+    from gmpy2 import mpq
+    # x'\x     0        1
+    # 0    [0] p00  [1] p10
+    # 1    [2] p01  [3] p11
+    p_not_x = table[0] + table[2]
+    p_x = table[1] + table[3]
+    q0 = table[2] / p_not_x if p_not_x else mpq(0)
+    q1 = table[3] / p_x if p_x else mpq(0)
+    steps = _steps(f_profile)
+
+    powers = {}
+    for q in (q0, q1):
+        q_powers = [mpq(1)]
+        not_q_powers = [mpq(1)]
+        for _ in range(n):
+            q_powers.append(q_powers[-1] * q)
+            not_q_powers.append(not_q_powers[-1] * (1 - q))
+        powers[q] = (q_powers, not_q_powers)
+
+    def binomial(r: int, q):
+        q_powers, not_q_powers = powers[q]
+        return [math.comb(r, m) * q_powers[m] * not_q_powers[r - m] for m in range(r + 1)]
+
+    tp = mpq(0)
+    fp = mpq(0)
+    for i in range(n + 1):
+        if uo_profile[i]:
+            continue
+        #P(f(x') | I = i)
+        flagged = mpq(int(f_profile[0]))
+        if steps:
+            m_pmf = binomial(i, q1)
+            l_pmf = binomial(n - i, q0)
+            #l_tail[u] = P(L >= u)
+            l_tail = [mpq(0)] * (n - i + 2)
+            for u in range(n - i, -1, -1):
+                l_tail[u] = l_tail[u + 1] + l_pmf[u]
+            for t, step in steps:
+                at_least_t = sum(m_pmf[m] * l_tail[min(max(t - m, 0), n - i + 1)] for m in range(i + 1))
+                flagged += step * at_least_t
+        weight = math.comb(n, i) * p_x ** i * p_not_x ** (n - i) * flagged
+        if f_profile[i]:
+            tp += weight
+        else:
+            fp += weight
+    return tp, fp
+
+
+def _closed_form_float(n: int, table: list[float], f_profile: list[bool], uo_profile: list[bool]):
+    p_not_x = table[0] + table[2]
+    p_x = table[1] + table[3]
+    q0 = table[2] / p_not_x if p_not_x else 0.0
+    q1 = table[3] / p_x if p_x else 0.0
+    steps = _steps(f_profile)
+    step_t = np.array([t for t, _ in steps], dtype=np.int64)
+    step_sign = np.array([s for _, s in steps], dtype=np.float64)
+    log_factorial = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, n + 1, dtype=np.float64)))))
+
+    def binomial(r: int, q: float) -> np.ndarray:
+        m = np.arange(r + 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_pmf = (log_factorial[r] - log_factorial[m] - log_factorial[r - m]
+                       + np.where(m > 0, m * np.log(q), 0.0) + np.where(r - m > 0, (r - m) * np.log1p(-q), 0.0))
+        return np.exp(log_pmf)
+
+    i_pmf = binomial(n, p_x / (p_x + p_not_x)) * (p_x + p_not_x) ** n if p_x + p_not_x else np.zeros(n + 1)
+    flagged = np.full(n + 1, float(f_profile[0]))
+    if steps:
+        for i in range(n + 1):
+            if uo_profile[i] or i_pmf[i] == 0.0:
+                continue
+            m_pmf = binomial(i, q1)
+            #l_tail[u] = P(L >= u) for u = 0 .. n - i + 1
+            l_tail = np.concatenate((np.cumsum(binomial(n - i, q0)[::-1])[::-1], [0.0]))
+            index = np.clip(step_t[:, None] - np.arange(i + 1)[None, :], 0, n - i + 1)
+            flagged[i] += step_sign @ (l_tail[index] @ m_pmf)
+    keep = ~np.array(uo_profile, dtype=bool)
+    f_values = np.array(f_profile, dtype=bool)
+    weights = i_pmf * flagged
+    return float(weights[keep & f_values].sum()), float(weights[keep & ~f_values].sum())
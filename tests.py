@@ -1,23 +1,68 @@
 
-import glob
+import contextlib
+import io
+import itertools
+import math
+import random
 import os
-import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
+from unittest import mock
 from bdd import BDD, BDDNode
+import benchmark
+import instrumentation
+import threshold
+import symmetric
+import sampling
+import batch
+import parallel
+import bounds
+import server
+import asyncio
+import loaders
+import cli
+import add
+import incremental
+import tracing
+import export
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from tracing import TraceLevel
+import numpy as np
+from vectorized import ArrayBDD
+from model import Model
+from gmpy2 import mpq
 
-# deletes all files from the out folder 
-def delete_all_files_from_out():
-    files = glob.glob('out/*')
-    for obj in files:
-        if os.path.isfile(obj):
-            os.remove(obj)
-        elif os.path.isdir(obj):
-            shutil.rmtree(obj)
+#the examples of model.py, probabilities, f and uo of each
+P_XYZ = {
+    "x": [mpq(0.2), mpq(0.3), mpq(0.4), mpq(0.1)],
+    "y": [mpq(0.15), mpq(0.6), mpq(0.13), mpq(0.12)],
+    "z": [mpq(0.23), mpq(0.17), mpq(0.2), mpq(0.4)]
+}
+F_XYZ = "(x and y) or (x and not y and not z) or (not x and y and not z) or (not x and not y and z)"
+UO_XYZ = "(x and z) or (not x and y)"
+
+P_ABC = {
+    "a": [mpq(0.05), mpq(0.65), mpq(0.05), mpq(0.25)],
+    "b": [mpq(0.2), mpq(0.4), mpq(0.1), mpq(0.3)],
+    "c": [mpq(0.13), mpq(0.62), mpq(0.1), mpq(0.15)]
+}
+F_ABC = "a and (b or c and (a or not c))"
+UO_ABC = "not a and (b or (not b and c))"
+
+P_MNL = {
+    "m": [mpq(0.7), mpq(0.0), mpq(0.17), mpq(0.1)],
+    "n": [mpq(0.08), mpq(0.53), mpq(0.03), mpq(0.36)],
+    "l": [mpq(0.25), mpq(0.31), mpq(0.27), mpq(0.17)]
+}
+F_MNL = "((m or l) and (not m and n)) or (m and n)"
+UO_MNL = "(not m and not n) or (n and l)"
 
 class TestCalculations(unittest.TestCase):
     assignments1 = ({"X" : False, "Y" :True}, {"X" : False, "Y" :False})
-    delete_all_files_from_out()
-    
+
     #BDDNode
     def test_is_leaf(self):
         leaf = BDDNode(value = False)
@@ -174,6 +219,887 @@ class TestCalculations(unittest.TestCase):
         bdd1.generateDot("a")
         bdd2.generateDot("b")
         self.assertEqual(bdd1, bdd2)   
-        
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_generated_expressions(self):
+        variables = benchmark.variable_names(4)
+        threshold = BDD(benchmark.threshold_expression(variables, 2), variables)
+        for assignment, value in threshold.evaluation.items():
+            self.assertEqual(value, sum(v for _, v in assignment) >= 2)
+        chain = BDD(benchmark.chain_expression(variables), variables)
+        self.assertTrue(chain.evaluation[tuple((v, True) for v in variables)])
+        self.assertFalse(chain.evaluation[tuple((v, False) for v in variables)])
+
+    def test_run_benchmarks(self):
+        results = benchmark.run_benchmarks(["cnf", "ladder"], [3], repeat=1, verbose=False)
+        self.assertEqual(len(results["results"]), 2)
+        for case in results["results"]:
+            self.assertEqual(set(case["seconds"]), set(benchmark.PHASES))
+            self.assertGreater(case["peak_bytes"]["build"], 0)
+        self.assertEqual(benchmark.find_regressions(results, results, 1.5), [])
+
+    def test_regressions_above_noise(self):
+        def results(*seconds):
+            return {"results": [{"name": f"ladder/{i}", "total_seconds": s} for i, s in enumerate(seconds)]}
+        baseline = results(0.0023, 0.2, 0.2)
+        current = results(0.0037, 0.25, 0.5)
+        self.assertEqual(benchmark.find_regressions(baseline, current, 1.5), [("ladder/2", 0.2, 0.5)])
+        self.assertEqual(len(benchmark.find_regressions(baseline, current, 1.5, min_seconds=0)), 2)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_disabled_by_default(self):
+        self.assertFalse(instrumentation.enabled())
+        with instrumentation.phase("build"):
+            pass
+        instrumentation.count("algorithm.iterations")
+
+    def test_records_phases_and_counters(self):
+        records = []
+        with instrumentation.instrument(callback=records.append) as recorder:
+            bdd1 = BDD("A or B", ["A", "B", "C"])
+            bdd1.reduce()
+            bdd2 = BDD("(B or C) and (A and C)", ["A", "B", "C"])
+            bdd2.reduce()
+            BDD.unite(bdd1, bdd2.rename_variables().negate(), ["A", "A_", "B", "B_", "C", "C_"])
+        self.assertFalse(instrumentation.enabled())
+        self.assertEqual(records, [recorder])
+        self.assertEqual(recorder.phases["build"]["calls"], 2)
+        self.assertIn("unite", recorder.phases)
+        self.assertGreater(recorder.counters["apply.cache_misses"], 0)
+        before = recorder.samples["reduce.nodes_before"]
+        after = recorder.samples["reduce.nodes_after"]
+        self.assertEqual(len(before), 3)
+        self.assertTrue(all(b >= a for b, a in zip(before, after)))
+        self.assertIn('"phases"', recorder.to_json())
+
+
+class TestThreshold(unittest.TestCase):
+    variables = ["A", "B", "C", "D", "E"]
+
+    def test_matches_expression_build(self):
+        for builder in (threshold.at_least_k, threshold.at_most_k, threshold.exactly_k):
+            for k in range(len(self.variables) + 2):
+                bdd = builder(self.variables, k)
+                expected = BDD(bdd.expression, self.variables)
+                expected.reduce()
+                self.assertEqual(bdd, expected)
+                self.assertEqual(bdd.node_count(), expected.node_count())
+
+    #built guards have no assignments, algorithm finds the f nodes from the structure of uo
+    def test_model_with_built_guards(self):
+        variables = self.variables + ["F"]
+        p = {var: [mpq(1, 10), mpq(2, 10), mpq(3, 10), mpq(4, 10)] for var in variables}
+        uo, f = threshold.exactly_k(variables, 2), threshold.at_least_k(variables, 3)
+        built = Model(0.05, uo, f, p, closed_form=False).algorithm("test_threshold", verbose=False)
+        expected = Model(0.05, uo.expression, f.expression, p, closed_form=False).algorithm("test_threshold",
+                                                                                          verbose=False)
+        self.assertEqual((built.tp_final, built.fp_final, built.iterations),
+                         (expected.tp_final, expected.fp_final, expected.iterations))
+        #no assignments are enumerated for wide guards
+        wide = [f"v{i}" for i in range(40)]
+        p = {var: p["A"] for var in wide}
+        model = Model(0.05, threshold.at_least_k(wide, 1), threshold.at_least_k(wide, 2), p)
+        self.assertEqual(model.uo.root.assignments, [])
+        model.algorithm("test_threshold", verbose=False)
+
+    def test_at_least_k_size(self):
+        variables = [f"x{i}" for i in range(40)]
+        bdd = threshold.at_least_k(variables, 3)
+        # 3 counts per level at most, plus both leafs
+        self.assertLessEqual(bdd.node_count(), 3 * len(variables) + 2)
+
+    def test_model_accepts_bdd(self):
+        p = {var: [mpq(1, 4)] * 4 for var in self.variables}
+        uo = "(A and not B) or (C and E)"
+        from_bdd = Model(0.05, BDD(uo, self.variables), threshold.at_least_k(self.variables, 3), p)
+        from_str = Model(0.05, uo, "(A + B + C + D + E ) >= 3", p)
+        self.assertEqual(from_bdd.f, from_str.f)
+        self.assertEqual(from_bdd.uo, from_str.uo)
+        with self.assertRaises(Exception):
+            Model(0.05, uo, threshold.at_least_k(["A", "B"], 1), p)
+
+
+class TestSymmetric(unittest.TestCase):
+    table = [mpq(3, 10), mpq(1, 20), mpq(1, 10), mpq(11, 20)]
+
+    def test_profile(self):
+        variables = ["A", "B", "C"]
+        self.assertEqual(symmetric.symmetric_profile(threshold.exactly_k(variables, 1)), [False, True, False, False])
+        bdd = BDD("(A and not B) or C", variables)
+        bdd.reduce()
+        self.assertIsNone(symmetric.symmetric_profile(bdd))
+
+    def test_closed_form_matches_bdd(self):
+        for n in range(1, 5):
+            variables = [f"x{i}" for i in range(n)]
+            p = {var: list(self.table) for var in variables}
+            for k in range(n + 1):
+                f = threshold.at_least_k(variables, k)
+                uo = threshold.exactly_k(variables, (k + 1) % (n + 1))
+                closed = Model(0.05, uo, f, p).closed_form_tp_fp()
+                exact = Model(0.05, uo, f, p, closed_form=False).calc_tp_fp("test_symmetric")
+                self.assertEqual(closed, exact)
+
+                float_p = {var: [float(v) for v in self.table] for var in variables}
+                tp, fp = Model(0.05, uo, f, float_p).closed_form_tp_fp()
+                self.assertAlmostEqual(tp, float(exact[0]))
+                self.assertAlmostEqual(fp, float(exact[1]))
+
+    def test_not_applicable(self):
+        p = {"A": list(self.table), "B": [mpq(1, 4)] * 4}
+        self.assertIsNone(Model(0.05, "A and B", "A or B", p).closed_form_tp_fp())
+
+
+class TestSampling(unittest.TestCase):
+    p = P_ABC
+    f = F_ABC
+    uo = UO_ABC
+
+    def test_compile_guard(self):
+        variables = ["a", "b", "c"]
+        rows = np.array([[a, b, c] for a in (False, True) for b in (False, True) for c in (False, True)])
+        for expression in (self.f, self.uo, "(a + b + c ) >= 2", "True"):
+            expected = [eval(expression, {}, dict(zip(variables, map(bool, row)))) for row in rows]
+            self.assertEqual(list(sampling.compile_guard(expression, variables)(rows)), expected)
+
+    def test_estimate_contains_exact_values(self):
+        tp, fp = Model(0.05, self.uo, self.f, self.p).calc_tp_fp("test_sampling")
+        estimate = Model(0.05, self.uo, self.f, self.p, build_bdds=False).sample_tp_fp(precision=2e-3, seed=7)
+        self.assertTrue(estimate.converged)
+        self.assertLessEqual(estimate.fp_interval[1] - estimate.fp_interval[0], 4e-3)
+        self.assertTrue(estimate.tp_interval[0] - 2e-3 <= float(tp) <= estimate.tp_interval[1] + 2e-3)
+        self.assertTrue(estimate.fp_interval[0] - 2e-3 <= float(fp) <= estimate.fp_interval[1] + 2e-3)
+
+    def test_seed_reproducible(self):
+        model = Model(0.05, self.uo, self.f, self.p, build_bdds=False)
+        first = model.sample_tp_fp(max_samples=20_000, batch_size=5_000, seed=1)
+        second = model.sample_tp_fp(max_samples=20_000, batch_size=5_000, seed=1)
+        self.assertEqual((first.tp, first.fp, first.samples), (second.tp, second.fp, 20_000))
+
+
+class TestBatchEvaluation(unittest.TestCase):
+    def test_matches_eval(self):
+        variables = ["A", "B", "C", "D"]
+        rows = np.random.default_rng(0).random((500, 4)) < 0.5
+        for expression in ("(A and B) or not C", "A or D", "(A + B + C + D ) == 2", "A or not A"):
+            bdd = BDD(expression, variables)
+            bdd.reduce()
+            expected = [eval(expression, {}, dict(zip(variables, map(bool, row)))) for row in rows]
+            self.assertEqual(list(bdd.evaluate_batch(rows)), expected)
+            self.assertEqual(list(ArrayBDD(bdd).evaluate(rows, chunk_size=64)), expected)
+
+    def test_model_uses_reduced_f(self):
+        variables = [f"x{i}" for i in range(12)]
+        p = {var: [mpq(1, 4)] * 4 for var in variables}
+        model = Model(0.05, "x0 and x1", threshold.at_least_k(variables, 4), p)
+        rows = np.random.default_rng(1).random((10_000, 12)) < 0.3
+        np.testing.assert_array_equal(model.evaluate_batch(rows), rows.sum(axis=1) >= 4)
+        with self.assertRaises(Exception):
+            model.evaluate_batch(rows[:, :5])
+
+
+class TestCodegen(unittest.TestCase):
+    variables = ["A", "B", "C", "D"]
+
+    def test_styles_match_eval(self):
+        for expression in ("(A and B) or not C", "A or D", "(A + B + C + D ) == 2", "A and not A"):
+            bdd = BDD(expression, self.variables)
+            bdd.reduce()
+            ifelse = bdd.compile()
+            bitmask = bdd.compile("bitmask")
+            for bits in range(16):
+                row = [bool(bits >> i & 1) for i in range(4)]
+                expected = eval(expression, {}, dict(zip(self.variables, row)))
+                self.assertEqual(ifelse(*row), expected)
+                self.assertEqual(bitmask(bits), expected)
+
+    def test_large_diagram_uses_helpers(self):
+        variables = [f"x{i}" for i in range(150)]
+        guard = threshold.at_least_k(variables, 70).compile()
+        self.assertIn("def _n", guard.source)
+        row = [i % 3 == 0 for i in range(150)]
+        self.assertEqual(guard(*row), sum(row) >= 70)
+
+    def test_cache_invalidated_by_algorithm(self):
+        model = Model(0.05, UO_XYZ, F_XYZ, P_XYZ)
+        before = model.f.compile()
+        self.assertIs(model.f.compile(), before)
+        with mock.patch("builtins.print"):
+            model.algorithm("test_codegen")
+        after = model.f.compile()
+        self.assertIsNot(after, before)
+        rows = np.array([[bool(bits >> i & 1) for i in range(3)] for bits in range(8)])
+        self.assertEqual([model.evaluate(row) for row in rows], list(model.evaluate_batch(rows)))
+
+
+class TestCubes(unittest.TestCase):
+    variables = ["A", "B", "C", "D"]
+
+    def test_sat_count(self):
+        for expression, expected in (("(A and B) or not C", 10), ("A or D", 12), ("D", 8), ("A and not A", 0)):
+            bdd = BDD(expression, self.variables)
+            bdd.reduce()
+            self.assertEqual(bdd.sat_count(), expected)
+            self.assertEqual(bdd.sat_count(False), 16 - expected)
+
+    def test_cubes_keep_dont_cares(self):
+        bdd = BDD("A or D", self.variables)
+        bdd.reduce()
+        self.assertEqual(list(bdd.iter_cubes()), [{"A": False, "D": True}, {"A": True}])
+        self.assertEqual(list(bdd.iter_cubes(False)), [{"A": False, "D": False}])
+
+    def test_lazy_on_large_diagram(self):
+        variables = [f"x{i}" for i in range(200)]
+        bdd = threshold.at_least_k(variables, 100)
+        self.assertEqual(bdd.sat_count(), sum(math.comb(200, k) for k in range(100, 201)))
+        cube = next(bdd.iter_cubes())
+        self.assertEqual(sum(cube.values()), 100)
+
+
+class TestTopPaths(unittest.TestCase):
+    def test_top_k_paths(self):
+        p = P_XYZ
+        f = BDD(F_XYZ, list(p))
+        f.reduce()
+        uo = BDD(UO_XYZ, list(p))
+        uo.reduce()
+        fp = BDD.unite(f.rename_variables(), BDD.unite(f.negate(), uo.negate(), list(p)),
+                       ["x", "x_", "y", "y_", "z", "z_"])
+        fp.set_probabilities(p)
+
+        paths = fp.top_k_paths(100)
+        probabilities = [probability for _, probability in paths]
+        self.assertEqual(probabilities, sorted(probabilities, reverse=True))
+        self.assertEqual(sum(probabilities), fp.sum_probabilities_positive_cases())
+        self.assertEqual(fp.top_k_paths(2), paths[:2])
+        self.assertEqual(paths[0][0], {"x": False, "x_": True, "y": False, "y_": True, "z": False})
+
+    #x and x_ nodes with the same children are both parents of a node
+    def test_alt_parents(self):
+        variables = [f"v{i}" for i in range(5)]
+        p = {var: [mpq(1, 4)] * 4 for var in variables}
+        f = BDD("(not v0 and v2) or (v2 and not v3) or (v1 and not v4) or (not v2 and not v4)", variables)
+        f.reduce()
+        uo = BDD("(v1 and not v4) or (not v2 and v3)", variables)
+        uo.reduce()
+        united_vars = [v for var in variables for v in (var, var + "_")]
+        for not_uo_f in (BDD.unite(f.negate(), uo.negate(), variables), BDD.unite(uo.negate(), f, variables)):
+            product = BDD.unite(f.rename_variables(), not_uo_f, united_vars)
+            product.set_probabilities(p)
+            paths = product.top_k_paths(3)
+            self.assertEqual(len(paths), 3)
+            probabilities = [probability for _, probability in paths]
+            self.assertEqual(probabilities, sorted(probabilities, reverse=True))
+            all_probabilities = [probability for _, probability in product.top_k_paths(1000)]
+            self.assertEqual(all_probabilities[:3], probabilities)
+            self.assertEqual(sum(all_probabilities), product.sum_probabilities_positive_cases())
+
+
+class TestTracing(unittest.TestCase):
+    p = P_ABC
+
+    def test_off_by_default(self):
+        bdd = BDD("a and b", ["a", "b"])
+        with mock.patch.object(tracing.get_writer(), "write") as write:
+            bdd.generateDot("test_tracing/off")
+            with mock.patch("builtins.print"):
+                Model(0.05, "not a and b", "a and (b or c)", self.p, closed_form=False).algorithm("test_tracing")
+        write.assert_not_called()
+
+    def test_levels(self):
+        bdd = BDD("a and b", ["a", "b"])
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(export, "OUTPUT_DIRECTORY", directory):
+            bdd.generateDot("test_tracing/summary", TraceLevel.SUMMARY)
+            bdd.trace_level = TraceLevel.FULL
+            bdd.generateDot("test_tracing/full")
+            tracing.get_writer().flush()
+            with open(os.path.join(directory, "test_tracing", "summary.dot")) as summary:
+                self.assertNotIn("'a': True", summary.read())
+            with open(os.path.join(directory, "test_tracing", "full.dot")) as full:
+                self.assertIn("'a': True", full.read())
+        self.assertEqual(tracing.get_writer().errors, [])
+
+    def test_flush_reports_errors(self):
+        writer = tracing.DotWriter()
+        with tempfile.TemporaryDirectory() as directory:
+            blocked = os.path.join(directory, "file")
+            open(blocked, "w").close()
+            writer.write(os.path.join(blocked, "graph.dot"), "digraph {}")
+            with self.assertRaises(Exception):
+                writer.flush()
+        #every error is reported once
+        writer.flush()
+
+
+class TestExport(unittest.TestCase):
+    def test_json_graph(self):
+        bdd = BDD("A and not B", ["A", "B"])
+        bdd.reduce()
+        graph = json.loads(export.to_json(bdd))
+        self.assertEqual(graph["nodes"][0], "A")
+        self.assertFalse(graph["truncated"])
+        successors = {(source, bit): graph["nodes"][target] for source, target, bit, _ in graph["edges"]}
+        b = graph["nodes"].index("B")
+        self.assertEqual(successors[(0, 0)], "False")
+        self.assertEqual(successors[(b, 0)], "True")
+        self.assertEqual(successors[(b, 1)], "False")
+
+    def test_bounded_and_deterministic(self):
+        variables = [f"x{i}" for i in range(8)]
+        bdd = threshold.at_least_k(variables, 4)
+        nodes_before = bdd.node_count()
+        dot = export.to_dot(bdd, full=True, max_nodes=5)
+        self.assertEqual(dot, export.to_dot(bdd.copy_bdd(), full=True, max_nodes=5))
+        self.assertEqual(sum(1 for line in dot.splitlines() if "[label=" in line and "->" not in line), 5)
+        graph = json.loads(export.to_json(bdd, full=True, max_nodes=5, max_assignments=1))
+        self.assertTrue(graph["truncated"])
+        self.assertEqual(len(graph["nodes"]), 5)
+        self.assertTrue(all(len(lines) <= 2 for lines in graph["assignments"]))
+        self.assertEqual(bdd.node_count(), nodes_before)
+
+    def test_output_path(self):
+        self.assertEqual(export.output_path("test1\\bdd_f_1"), os.path.join("out", "test1", "bdd_f_1.dot"))
+        self.assertEqual(export.output_path("a/b", "json"), os.path.join("out", "a", "b.json"))
+
+
+class TestFrozen(unittest.TestCase):
+    p = P_XYZ
+    f = F_XYZ
+    uo = UO_XYZ
+
+    def test_weighted_count_matches_sum(self):
+        variables = list(self.p.keys())
+        f = BDD(self.f, variables)
+        f.reduce()
+        uo = BDD(self.uo, variables)
+        uo.reduce()
+        united_vars = [v for var in variables for v in (var, var + "_")]
+        fp = BDD.unite(f.rename_variables(), BDD.unite(f.negate(), uo.negate(), variables), united_vars)
+        snapshot = fp.freeze()
+        fp.set_probabilities(self.p)
+        self.assertEqual(snapshot.weighted_count(self.p), fp.sum_probabilities_positive_cases())
+        float_p = {var: [float(v) for v in table] for var, table in self.p.items()}
+        self.assertAlmostEqual(snapshot.weighted_count(float_p), float(fp.sum_probabilities_positive_cases()))
+
+    def test_concurrent_queries(self):
+        variables = list(self.p.keys())
+        bdd = BDD(self.f, variables)
+        bdd.reduce()
+        snapshot = bdd.freeze()
+        #changes of the BDD after freezing don't reach the snapshot
+        bdd.root = bdd.leafs[False]
+        with self.assertRaises(Exception):
+            snapshot.root = 0
+        #the array store behind the snapshot is read only as well
+        with self.assertRaises(Exception):
+            snapshot._arrays.root = 0
+        with self.assertRaises(ValueError):
+            snapshot._arrays.children[2] = 0
+        assignments = list(BDD(self.f, variables).evaluation.items())
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda item: snapshot.evaluate([v for _, v in item[0]]), assignments * 50))
+        self.assertEqual(results, [value for _, value in assignments] * 50)
+        self.assertEqual(json.loads(snapshot.export("json"))["nodes"][0], "x")
+
+
+class TestBatch(unittest.TestCase):
+    configs = [
+        {"name": "test1", "threshold": 0.05, "f_guard": F_ABC, "unobservable": UO_ABC,
+         "probabilities": {"a": ["0.05", "0.65", "0.05", "0.25"], "b": ["0.2", "0.4", "0.1", "0.3"],
+                           "c": ["0.13", "0.62", "0.1", "0.15"]}},
+        {"name": "test2", "threshold": 0.5, "f_guard": "a or b", "unobservable": "a and b",
+         "probabilities": {"a": [0.25, 0.25, 0.25, 0.25], "b": ["1/10", "2/5", "1/5", "3/10"]}},
+        {"name": "broken", "threshold": 0.5, "f_guard": "a or d", "unobservable": "a",
+         "probabilities": {"a": [0.25, 0.25, 0.25, 0.25]}},
+    ]
+
+    def test_run_batch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, "configs.json")
+            with open(config_path, "w") as file:
+                json.dump(self.configs, file)
+            output = os.path.join(directory, "results.jsonl")
+            failed = batch.run_batch(batch.read_configs(config_path), output, workers=2)
+            with open(output) as file:
+                results = {result["name"]: result for result in map(json.loads, file)}
+        self.assertEqual(failed, 1)
+        self.assertIn("error", results["broken"])
+        for config in self.configs[:2]:
+            p = batch.parse_probabilities(config["probabilities"])
+            model = Model(config["threshold"], config["unobservable"], config["f_guard"], p)
+            expected = model.algorithm(config["name"], verbose=False)
+            self.assertAlmostEqual(results[config["name"]]["fp_final"], float(expected.fp_final))
+            self.assertAlmostEqual(results[config["name"]]["tp_initial"], float(expected.tp_initial))
+            self.assertEqual(results[config["name"]]["acceptable"], expected.acceptable)
+
+
+class TestParallel(unittest.TestCase):
+    def test_serialize(self):
+        bdd = threshold.at_least_k([f"x{i}" for i in range(5)], 2)
+        self.assertEqual(parallel.deserialize(parallel.serialize(bdd)), bdd)
+
+    def test_unite_matches_sequential(self):
+        variables = [f"x{i}" for i in range(6)]
+        f = threshold.at_least_k(variables, 3)
+        not_uo = threshold.exactly_k(variables, 2).negate()
+        order = [v for var in variables for v in (var, var + "_")]
+        f_replaced = f.rename_variables()
+        product = BDD.unite(f.negate(), not_uo, variables)
+        for depth in (0, 1, 3, len(order)):
+            self.assertEqual(parallel.unite(f_replaced, product, order, depth=depth, workers=2),
+                             BDD.unite(f_replaced, product, order))
+
+    def test_model(self):
+        p, f, uo = P_ABC, F_ABC, UO_ABC
+        expected = Model(0.05, uo, f, p).calc_tp_fp("test_parallel")
+        with mock.patch("concurrent.futures.ProcessPoolExecutor", wraps=ProcessPoolExecutor) as pool:
+            with Model(0.05, uo, f, p, parallel_workers=2) as model:
+                #one pool for all products of both calls
+                self.assertEqual(model.calc_tp_fp("test_parallel"), expected)
+                self.assertEqual(model.calc_tp_fp("test_parallel"), expected)
+            pool.assert_called_once_with(max_workers=2)
+
+
+class TestAlgorithm(unittest.TestCase):
+    #the examples of model.py as (probabilities, f, uo)
+    examples = ((P_XYZ, F_XYZ, UO_XYZ), (P_ABC, F_ABC, UO_ABC), (P_MNL, F_MNL, UO_MNL))
+
+    def model(self):
+        variables = [f"v{i}" for i in range(8)]
+        p = {var: [mpq(1, 10), mpq(2, 10), mpq(3, 10), mpq(4, 10)] for var in variables}
+        return Model(0.05, threshold.exactly_k(variables, 3), threshold.at_least_k(variables, 4), p, closed_form=False)
+
+    #values of the enumeration of all (x, x') assignments; reduce used to merge x and x_ nodes with equal children,
+    #which gave wrong values for two of these examples
+    def test_example_values(self):
+        expected = ((0.14651, 0.04814), (0.12675, 0.0129), (0.01872, 0.102864))
+        for (p, f, uo), values in zip(self.examples, expected):
+            tp, fp = Model(0.05, uo, f, p, closed_form=False).calc_tp_fp("test_algorithm")
+            self.assertAlmostEqual(float(tp), values[0], places=12)
+            self.assertAlmostEqual(float(fp), values[1], places=12)
+
+    def test_find_nodes_in_uo(self):
+        model = self.model()
+        uo = model.uo.rename_variables()
+        nodes = model.find_nodes_in_uo(uo)
+        self.assertIs(nodes[0], model.find_node_in_uo(uo))
+        for node in nodes:
+            self.assertEqual({node.negative_child.value, node.positive_child.value}, {False, True})
+
+    def test_f_index(self):
+        for p, f, uo in self.examples:
+            model = Model(0.05, uo, f, p, closed_form=False)
+            bdd_uo = model.uo.rename_variables()
+            f_index = model.f_index(bdd_uo)
+            #the diagrams built from expressions carry their assignments, the index gives the same f nodes
+            for node in bdd_uo.breadth_first_bottom_up_search():
+                if not node.isLeaf():
+                    self.assertEqual({id(n) for n in model.find_node_in_f(node, f_index)},
+                                     {id(n) for n in model.find_node_in_f(node)})
+
+    #every assignment of a uo node is walked from the root of f
+    def test_find_node_in_f(self):
+        p, f, uo = self.examples[0]
+        model = Model(0.05, uo, f, p, closed_form=False)
+        for node in model.find_nodes_in_uo(model.uo.rename_variables()):
+            expected = set()
+            for assignment in node.assignments:
+                current = model.f.root
+                for var, value in assignment.items():
+                    if current.variable == var:
+                        current = current.positive_child if value else current.negative_child
+                expected.add(current)
+            self.assertEqual(model.find_node_in_f(node), expected)
+
+    def test_example_final_values(self):
+        expected = ((0.18924, 0.05936), (0.12675, 0.0129), (0.01872, 0.034824))
+        for (p, f, uo), values in zip(self.examples, expected):
+            result = Model(0.05, uo, f, p, closed_form=False).algorithm("test_algorithm", verbose=False)
+            self.assertAlmostEqual(float(result.tp_final), values[0], places=12)
+            self.assertAlmostEqual(float(result.fp_final), values[1], places=12)
+
+    #a round redirects the f nodes found before any of its changes, here f ends with 16 instead of 32 models
+    def test_batched_differs(self):
+        variables = [f"v{i}" for i in range(5)]
+        p = {var: [mpq(1, 4)] * 4 for var in variables}
+        f = "(not v2) or (v2 and not v2 and not v4) or (v4 and v1)"
+        uo = ("(not v0 and v1 and not v3 and not v0) or (v3 and v1 and v3) or (v2 and not v3 and not v0) or "
+              "(v4 and v1 and not v2 and not v4) or (not v1 and not v4)")
+        sequential = Model(0.05, uo, f, p, closed_form=False)
+        batched = Model(0.05, uo, f, p, closed_form=False)
+        results = (sequential.algorithm("test_algorithm", verbose=False),
+                   batched.algorithm("test_algorithm", verbose=False, batched=True))
+        self.assertEqual((sequential.f.sat_count(), results[0].tp_final, results[0].fp_final), (32, mpq(11, 32), 0))
+        self.assertEqual((batched.f.sat_count(), results[1].tp_final, results[1].fp_final),
+                         (16, mpq(3, 32), mpq(5, 64)))
+
+    def test_batched(self):
+        sequential = self.model().algorithm("test_algorithm", verbose=False)
+        batched = self.model().algorithm("test_algorithm", verbose=False, batched=True)
+        self.assertLess(batched.iterations, sequential.iterations)
+        self.assertEqual((batched.tp_final, batched.fp_final), (sequential.tp_final, sequential.fp_final))
+
+    def test_trajectory(self):
+        result = self.model().algorithm("test_algorithm", verbose=False)
+        tracked = self.model().algorithm("test_algorithm", verbose=False, track=True)
+        self.assertEqual(len(tracked.trajectory), tracked.iterations + 1)
+        self.assertEqual(tracked.trajectory[0], (result.tp_initial, result.fp_initial))
+        self.assertEqual(tracked.trajectory[-1], (result.tp_final, result.fp_final))
+
+    def test_stop_when_acceptable(self):
+        tracked = self.model().algorithm("test_algorithm", verbose=False, track=True)
+        first = next(i for i, (_, fp) in enumerate(tracked.trajectory) if fp < 0.01)
+        self.assertGreater(first, 0)
+        model = self.model()
+        model.acceptable_threshold = 0.01
+        stopped = model.algorithm("test_algorithm", verbose=False, stop_when_acceptable=True)
+        self.assertTrue(stopped.acceptable)
+        self.assertEqual(stopped.iterations, first)
+        self.assertEqual(stopped.trajectory, tracked.trajectory[:first + 1])
+        model = self.model()
+        model.acceptable_threshold = 1
+        self.assertEqual(model.algorithm("test_algorithm", verbose=False, stop_when_acceptable=True).iterations, 0)
+
+
+class TestIncremental(unittest.TestCase):
+    def models(self):
+        for p, f, uo in TestAlgorithm.examples:
+            yield Model(0.05, uo, f, p, closed_form=False)
+        yield TestAlgorithm.model(self)
+
+    #every value of a tracked run is the one of calc_tp_fp for f after that iteration
+    def test_matches_calc_tp_fp(self):
+        tp_fp = incremental.IncrementalTpFp.tp_fp
+        for model in self.models():
+            calls = []
+
+            def checked(tracker, f):
+                values = tp_fp(tracker, f)
+                self.assertEqual(values, model.calc_tp_fp("test_incremental"))
+                calls.append(values)
+                return values
+            with mock.patch.object(incremental.IncrementalTpFp, "tp_fp", checked):
+                result = model.algorithm("test_incremental", verbose=False, track=True)
+            self.assertEqual(calls, result.trajectory[1:])
+
+    def test_reuses_unchanged_parts(self):
+        model = TestAlgorithm.model(self)
+        tracker = incremental.IncrementalTpFp(model.uo.negate(), model.vars, model.probabilities)
+        values = tracker.tp_fp(model.f)
+        size, products = len(tracker), len(tracker.and_computed)
+        self.assertEqual(tracker.tp_fp(model.f), values)
+        self.assertEqual((len(tracker), len(tracker.and_computed)), (size, products))
+
+    def test_float(self):
+        for model in self.models():
+            tracker = incremental.IncrementalTpFp(model.uo.negate(), model.vars, model.probabilities, "float")
+            tp, fp = tracker.tp_fp(model.f)
+            expected = model.calc_tp_fp("test_incremental")
+            self.assertIsInstance(tp, float)
+            self.assertAlmostEqual(tp, float(expected[0]), places=12)
+            self.assertAlmostEqual(fp, float(expected[1]), places=12)
+
+
+class TestBounds(unittest.TestCase):
+    p = P_XYZ
+    f = F_XYZ
+    uo = UO_XYZ
+
+    def test_interval(self):
+        for p in (mpq(1, 3), mpq(1, 10), mpq(1, 2), 0.1):
+            lower, upper = bounds.interval(p)
+            self.assertTrue(lower <= p <= upper)
+            self.assertLessEqual(upper - lower, 2 * math.ulp(float(p)))
+
+    def test_verdict_matches_exact(self):
+        model = Model(0.05, self.uo, self.f, self.p)
+        tp, fp = model.calc_tp_fp("test_bounds")
+        for threshold, exact_needed in ((float(fp) / 2, False), (float(fp) * 2, False), (fp, True)):
+            model.acceptable_threshold = threshold
+            verdict = model.check_acceptable_bounded()
+            self.assertEqual(verdict.acceptable, model.check_acceptable(fp))
+            self.assertTrue(verdict.lower <= fp <= verdict.upper)
+            self.assertEqual(verdict.exact is not None, exact_needed)
+
+    def test_early_verdict(self):
+        variables = [f"x{i}" for i in range(6)]
+        p = {var: [mpq(1, 10), mpq(2, 10), mpq(3, 10), mpq(4, 10)] for var in variables}
+        p["x0"] = [mpq(1, 4)] * 4
+        model = Model(0.9, threshold.exactly_k(variables, 2), threshold.at_least_k(variables, 3), p)
+        verdict = model.check_acceptable_bounded()
+        self.assertTrue(verdict.acceptable)
+        self.assertIsNone(verdict.exact)
+        self.assertLess(verdict.visited, 5)
+
+
+class TestWeightedCount(unittest.TestCase):
+    def test_float_kernel_matches_exact(self):
+        for n in (3, 6):
+            variables = [f"x{i}" for i in range(n)]
+            p = {var: [mpq(i + 1, 10) for i in range(4)] for var in variables}
+            p["x1"] = [mpq(3, 8), mpq(1, 8), mpq(1, 8), mpq(3, 8)]
+            f = threshold.at_least_k(variables, 2)
+            not_uo = threshold.exactly_k(variables, 1).negate()
+            order = [v for var in variables for v in (var, var + "_")]
+            for bdd in (f, BDD.unite(f.rename_variables(), BDD.unite(f.negate(), not_uo, variables), order)):
+                exact = bdd.weighted_count(p)
+                self.assertAlmostEqual(bdd.weighted_count(p, backend="float"), float(exact), places=12)
+                self.assertAlmostEqual(ArrayBDD(bdd).weighted_count(p, np.float32), float(exact), places=5)
+
+    def test_model_backend(self):
+        p, f, uo = P_ABC, F_ABC, UO_ABC
+        exact = Model(0.05, uo, f, p).calc_tp_fp("test_weighted_count")
+        approximate = Model(0.05, uo, f, p, backend="float").calc_tp_fp("test_weighted_count")
+        for e, a in zip(exact, approximate):
+            self.assertIsInstance(a, float)
+            self.assertAlmostEqual(a, float(e), places=12)
+
+    def test_guard_ignores_a_variable(self):
+        p = {var: P_XYZ[var] for var in ("x", "y")}
+        #f doesn't test y, so the diagrams have no y_ level nodes
+        for uo, f in (("x and y", "x"), ("x", "y"), ("not x", "x and not x")):
+            exact = Model(0.05, uo, f, p, closed_form=False).calc_tp_fp("test_weighted_count")
+            approximate = Model(0.05, uo, f, p, closed_form=False, backend="float").calc_tp_fp("test_weighted_count")
+            for e, a in zip(exact, approximate):
+                self.assertAlmostEqual(a, float(e), places=12)
+
+
+class TestServer(unittest.TestCase):
+    config = TestBatch.configs[0]
+
+    def test_coalesced_requests(self):
+        async def run():
+            model_server = server.ModelServer()
+            requests = [{"id": i, "op": "tp_fp", "config": self.config} for i in range(5)]
+            responses = await asyncio.gather(*(model_server.handle_request(r) for r in requests))
+            acceptable = await model_server.handle_request({"id": 5, "op": "acceptable", "config": self.config})
+            return model_server, responses, acceptable
+
+        model_server, responses, acceptable = asyncio.run(run())
+        p = batch.parse_probabilities(self.config["probabilities"])
+        tp, fp = Model(0.05, self.config["unobservable"], self.config["f_guard"], p).calc_tp_fp("test_server")
+        self.assertEqual([r["id"] for r in responses], list(range(5)))
+        for response in responses:
+            self.assertEqual(response["result"], {"tp": float(tp), "fp": float(fp)})
+        self.assertEqual(acceptable["result"]["acceptable"], fp < 0.05)
+        self.assertEqual(model_server.stats["models_built"], 1)
+        self.assertGreaterEqual(model_server.stats["coalesced"], 4)
+
+    def test_socket(self):
+        observations = [[a, b, c] for a in (False, True) for b in (False, True) for c in (False, True)]
+
+        async def run(path):
+            model_server = server.ModelServer()
+            async with await server.start_server(model_server, path):
+                reader, writer = await asyncio.open_unix_connection(path)
+                for request in ({"id": 1, "op": "evaluate", "config": self.config, "observations": observations},
+                                {"id": 2, "op": "unknown"}):
+                    writer.write((json.dumps(request) + "\n").encode())
+                await writer.drain()
+                responses = [json.loads(await reader.readline()) for _ in range(2)]
+                writer.close()
+            return {response["id"]: response for response in responses}
+
+        with tempfile.TemporaryDirectory() as directory:
+            responses = asyncio.run(run(os.path.join(directory, "model.sock")))
+        expected = [bool(eval(self.config["f_guard"], {}, dict(zip("abc", o)))) for o in observations]
+        self.assertEqual(responses[1]["result"], expected)
+        self.assertIn("error", responses[2])
+
+    def test_observations_of_wrong_width(self):
+        async def run():
+            model_server = server.ModelServer()
+            #six values would fit two rows of three after a reshape
+            return [await model_server.handle_request({"id": i, "op": "evaluate", "config": self.config,
+                                                       "observations": observations})
+                    for i, observations in enumerate(([[True, False], [True, True], [False, False]],
+                                                      [True, False, True, False, True, False]))]
+
+        for response in asyncio.run(run()):
+            self.assertNotIn("result", response)
+            self.assertIn("expected observations as rows of 3 values", response["error"])
+
+
+class TestLoaders(unittest.TestCase):
+    def assert_same_function(self, bdd: BDD, expression: str, variables: list[str]):
+        rows = np.array([[bool(bits >> i & 1) for i in range(len(variables))] for bits in range(1 << len(variables))])
+        expected = [eval(expression, {}, dict(zip(variables, map(bool, row)))) for row in rows]
+        self.assertEqual(bdd.evaluate_batch(rows).tolist(), expected)
+
+    def test_apply_or(self):
+        variables = ["a", "b", "c"]
+        bdd = BDD.apply(BDD("a and not b", variables), BDD("c", variables), variables, "or")
+        self.assertEqual(bdd.expression, "(a and not b)or(c)")
+        self.assert_same_function(bdd, bdd.expression, variables)
+
+    def test_dimacs(self):
+        rng = random.Random(5)
+        variables = [f"x{i}" for i in range(1, 9)]
+        clauses = [[rng.choice((1, -1)) * rng.randint(1, 8) for _ in range(3)] for _ in range(20)]
+        expression = " and ".join("(" + " or ".join(("" if l > 0 else "not ") + f"x{abs(l)}" for l in c) + ")"
+                                  for c in clauses)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "guard.cnf")
+            with open(path, "w") as file:
+                file.write(f"c random 3-CNF\np cnf 8 {len(clauses)}\n")
+                for clause in clauses:
+                    file.write(" ".join(map(str, clause)) + " 0\n")
+            for window in (0, 7, 1024):
+                bdd = loaders.load_dimacs(path, window=window)
+                self.assert_same_function(bdd, expression, variables)
+                reference = BDD(expression, variables)
+                reference.reduce()
+                self.assertEqual(bdd.node_count(), reference.node_count())
+
+    def test_loaded_unobservable(self):
+        n = 40
+        variables = [f"x{i}" for i in range(1, n + 1)]
+        p = {var: [mpq(1, 10), mpq(2, 10), mpq(3, 10), mpq(4, 10)] for var in variables}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "uo.cnf")
+            with open(path, "w") as file:
+                file.write(f"p cnf {n} 1\n1 {n} 0\n")
+            uo = loaders.load_dimacs(path)
+        #a 4 node uo over 40 variables, Model must not enumerate its 2^40 assignments
+        model = Model(0.05, uo, loaders.clause_bdd([("x1", True), ("x2", False)], variables), p)
+        result = model.algorithm("test_loaders", verbose=False)
+        expected = Model(0.05, "(x1 or x40)", "(x1 or not x2)", {var: p[var] for var in ("x1", "x2", "x40")})
+        self.assertEqual((result.tp_initial, result.fp_initial), expected.calc_tp_fp("test_loaders"))
+
+    def test_json_tree(self):
+        variables = ["a", "b", "c"]
+        tree = {"op": "and", "args": [
+            {"op": "or", "args": [{"var": "a"}, {"op": "not", "args": [{"var": "c"}]}]},
+            {"op": "not", "args": [{"op": "and", "args": [{"var": "a"}, {"var": "b"}, {"const": True}]}]},
+        ]}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "guard.json")
+            with open(path, "w") as file:
+                json.dump({"variables": variables, "expression": tree}, file)
+            bdd = loaders.load_json_tree(path)
+        self.assert_same_function(bdd, "(a or not c) and not (a and b)", variables)
+        p = {var: [mpq(1, 4)] * 4 for var in variables}
+        p["a"] = [mpq(1, 10), mpq(2, 10), mpq(3, 10), mpq(4, 10)]
+        #the expression of the loaded guard is renamed together with its nodes
+        renamed = Model(0.05, "a and c", bdd, p).f.rename_variables()
+        self.assert_same_function(renamed, renamed.expression, renamed.variables)
+        self.assertEqual(Model(0.05, "a and c", bdd, p).calc_tp_fp("test_loaders"),
+                         Model(0.05, "a and c", "(a or not c) and not (a and b)", p).calc_tp_fp("test_loaders"))
+
+
+class TestCli(unittest.TestCase):
+    model = {"threshold": 0.05, "f_guard": "(x and y) or (not x and not y and z)", "unobservable": "x and z",
+             "probabilities": {"x": ["1/5", 0.3, 0.4, 0.1], "y": [0.15, 0.6, 0.13, 0.12],
+                               "z": [0.23, 0.17, 0.2, 0.4]}}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, "model.json")
+        with open(self.path, "w") as file:
+            json.dump(self.model, file)
+
+    #the whole output has to be the JSON result
+    def run_cli(self, *argv) -> dict:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(cli.main(list(argv)), 0)
+        return json.loads(output.getvalue())
+
+    def test_constant_products(self):
+        with open(self.path, "w") as file:
+            json.dump(dict(self.model, f_guard="x and y", unobservable="x or not x"), file)
+        self.assertEqual(self.run_cli("tp-fp", self.path), {"tp": 0.0, "fp": 0.0})
+
+    def test_tp_fp(self):
+        p = batch.parse_probabilities(self.model["probabilities"])
+        tp, fp = Model(0.05, self.model["unobservable"], self.model["f_guard"], p).calc_tp_fp("test_cli")
+        for options in ((), ("--backend", "float"), ("--order", "z,x,y")):
+            result = self.run_cli("tp-fp", self.path, *options)
+            self.assertAlmostEqual(result["tp"], float(tp), places=12)
+            self.assertAlmostEqual(result["fp"], float(fp), places=12)
+        self.assertEqual(self.run_cli("acceptable", self.path)["acceptable"], fp < 0.05)
+        self.assertEqual(self.run_cli("acceptable", self.path, "--bounded")["acceptable"], fp < 0.05)
+
+    def test_cache(self):
+        cache = os.path.join(self.directory, "cache")
+        first = self.run_cli("algorithm", self.path, "--cache", cache)
+        with mock.patch.object(cli, "build_model", wraps=cli.build_model) as build_model:
+            self.assertEqual(self.run_cli("algorithm", self.path, "--cache", cache), first)
+            build_model.assert_not_called()
+            self.run_cli("algorithm", self.path, "--cache", cache, "--batched")
+            build_model.assert_called_once()
+
+    def test_cache_follows_dimacs_files(self):
+        cache = os.path.join(self.directory, "cache")
+        with open(self.path, "w") as file:
+            json.dump(dict(self.model, f_guard={"dimacs": "f.cnf"}), file)
+        results = []
+        for clauses in ("1 2 0\n", "1 0\n"):
+            with open(os.path.join(self.directory, "f.cnf"), "w") as file:
+                file.write(f"p cnf 3 1\n{clauses}")
+            results.append(self.run_cli("tp-fp", self.path, "--cache", cache))
+        p = batch.parse_probabilities(self.model["probabilities"])
+        tp, fp = Model(0.05, self.model["unobservable"], "x ", p).calc_tp_fp("test_cli")
+        self.assertNotEqual(results[0], results[1])
+        self.assertAlmostEqual(results[1]["fp"], float(fp), places=12)
+
+    def test_lazy_imports(self):
+        code = ("import sys, model, cli; heavy = {'gmpy2', 'numpy'} & sys.modules.keys(); "
+                "cli.main(['tp-fp', sys.argv[1], '--backend', 'float']); print(sorted(heavy), 'gmpy2' in sys.modules)")
+        output = subprocess.run([sys.executable, "-c", code, self.path], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        self.assertEqual(output.splitlines()[-1], "[] False")
+
+
+class TestADD(unittest.TestCase):
+    p = P_XYZ
+    f = F_XYZ
+    uo = UO_XYZ
+
+    def model(self) -> Model:
+        return Model(0.05, self.uo, self.f, self.p, closed_form=False)
+
+    def test_no_free_variables(self):
+        model = self.model()
+        symbolic = model.symbolic_tp_fp([])
+        self.assertEqual(symbolic.size(), (0, 1))
+        self.assertEqual(symbolic.lookup({}), model.calc_tp_fp("test_add"))
+
+    def test_sum_over_free_variables(self):
+        model = self.model()
+        tp, fp = model.calc_tp_fp("test_add")
+        for free in (["x"], ["y", "z"], ["x", "y", "z"]):
+            symbolic = model.symbolic_tp_fp(free)
+            self.assertEqual(symbolic.variables, [v for var in free for v in (var, var + "_")])
+            total_tp, total_fp = mpq(0), mpq(0)
+            for values in itertools.product((False, True), repeat=2 * len(free)):
+                assignment = dict(zip(symbolic.variables, values))
+                weight = mpq(1)
+                for var in free:
+                    weight *= self.p[var][assignment[var] + 2 * assignment[var + "_"]]
+                tp_value, fp_value = symbolic.lookup(assignment)
+                total_tp += weight * tp_value
+                total_fp += weight * fp_value
+            self.assertEqual((total_tp, total_fp), (tp, fp))
+            #the paths of items cover every assignment once
+            covered = sum(2 ** (len(symbolic.variables) - len(cube)) for cube, _ in symbolic.items())
+            self.assertEqual(covered, 4 ** len(free))
+
+    def test_all_free_gives_indicators(self):
+        symbolic = self.model().symbolic_tp_fp(["x", "y", "z"])
+        self.assertEqual(set(value for _, value in symbolic.items()) - {(0, 0), (1, 0), (0, 1)}, set())
+        #x = 1, y = 0, z = 0 is flagged by f and perceived as x = 0, y = 1, z = 0, which f flags as well
+        assignment = {"x": True, "x_": False, "y": False, "y_": True, "z": False, "z_": False}
+        self.assertEqual(symbolic.lookup(assignment), (1, 0))
+
+    def test_unknown_free_variable(self):
+        with self.assertRaises(Exception):
+            self.model().symbolic_tp_fp(["w"])
+
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
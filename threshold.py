@@ -0,0 +1,76 @@
+from typing import Callable
+from bdd import BDD, BDDNode
+
+
+# builds the reduced BDD of a symmetric function directly, without evaluating a truth table
+# accepts(c) tells if an assignment with c positive variables satisfies the function
+# a node only exists for (level, count) pairs whose result still depends on the remaining variables
+def symmetric_bdd(variables: list[str], accepts: Callable[[int], bool], expression: str) -> BDD:
+    n = len(variables)
+    profile = [bool(accepts(c)) for c in range(n + 1)]
+    #prefix[c] = number of accepted counts below c, used to check if a count range is constant in O(1)
+    prefix = [0]
+    for value in profile:
+        prefix.append(prefix[-1] + value)
+
+    def constant(level: int, count: int):
+        accepted = prefix[count + n - level + 1] - prefix[count]
+        if accepted == 0:
+            return False
+        if accepted == n - level + 1:
+            return True
+        return None
+
+    bdd = BDD(expression, list(variables), build_new=False)
+
+    #top down: counts that are reachable and not yet decided on each level
+    levels = [[0]]
+    for level in range(n):
+        reachable = set()
+        for count in levels[level]:
+            if constant(level, count) is None:
+                reachable.add(count)
+                reachable.add(count + 1)
+        levels.append(sorted(reachable))
+
+    #bottom up: create the nodes, sharing equal (variable, negative child, positive child) triples
+    unique_table = {}
+    below = {}
+    for level in range(n, -1, -1):
+        current = {}
+        for count in levels[level]:
+            value = constant(level, count)
+            if value is not None:
+                current[count] = bdd.leafs[value]
+                continue
+            negative_child = below[count]
+            positive_child = below[count + 1]
+            if negative_child is positive_child:
+                current[count] = negative_child
+                continue
+            key = (variables[level], id(negative_child), id(positive_child))
+            if key not in unique_table:
+                unique_table[key] = BDDNode(var=variables[level], negative_child=negative_child,
+                                            positive_child=positive_child)
+            current[count] = unique_table[key]
+        below = current
+    bdd.root = below[0]
+    return bdd
+
+
+# expression equivalent to the built diagram, every variable is followed by a space for rename_variables
+def count_expression(variables: list[str], comparison: str) -> str:
+    return "(" + " + ".join(variables) + " ) " + comparison
+
+
+# at least k of the variables are set (minSize of _old/Case.py)
+def at_least_k(variables: list[str], k: int) -> BDD:
+    return symmetric_bdd(variables, lambda c: c >= k, count_expression(variables, f">= {k}"))
+
+
+def at_most_k(variables: list[str], k: int) -> BDD:
+    return symmetric_bdd(variables, lambda c: c <= k, count_expression(variables, f"<= {k}"))
+
+
+def exactly_k(variables: list[str], k: int) -> BDD:
+    return symmetric_bdd(variables, lambda c: c == k, count_expression(variables, f"== {k}"))
@@ -0,0 +1,57 @@
+import atexit
+import os
+import queue
+import threading
+from enum import Enum, auto
+
+
+class TraceLevel(Enum):
+    OFF = auto()  #no dot files
+    SUMMARY = auto()  #dot files with nodes, edges and probabilities
+    FULL = auto()  #dot files that also list the assignments of every node
+
+
+# writes files on a background thread, so tracing doesn't block the computation
+# at most max_pending files are buffered, write blocks while the buffer is full
+class DotWriter:
+    def __init__(self, max_pending: int = 64):
+        self.__queue = queue.Queue(maxsize=max_pending)
+        self.__thread = None
+        self.__lock = threading.Lock()
+        self.errors = []
+
+    def write(self, path: str, content: str):
+        with self.__lock:
+            if self.__thread is None or not self.__thread.is_alive():
+                self.__thread = threading.Thread(target=self.__run, name="dot-writer", daemon=True)
+                self.__thread.start()
+        self.__queue.put((path, content))
+
+    #blocks until all buffered files are written, raises if some of them couldn't be written since the last flush
+    def flush(self):
+        self.__queue.join()
+        if self.errors:
+            errors, self.errors = self.errors, []
+            raise Exception(f"{len(errors)} trace files could not be written, first {errors[0][0]}: {errors[0][1]}")
+
+    def __run(self):
+        while True:
+            path, content = self.__queue.get()
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(path, "w") as out:
+                    out.write(content)
+            except OSError as e:
+                self.errors.append((path, e))
+            finally:
+                self.__queue.task_done()
+
+
+_writer = DotWriter()
+atexit.register(_writer.flush)
+
+
+def get_writer() -> DotWriter:
+    return _writer
@@ -0,0 +1,139 @@
+import numpy as np
+from bdd import BDD, variable_name
+
+
+# array node store of a BDD: node i tests variable level[i] (index into bdd.variables) and continues with
+# negative[i] or positive[i]; leafs are the nodes 0 (False) and 1 (True), they point to themselves
+class ArrayBDD:
+    FALSE = 0
+    TRUE = 1
+
+    def __init__(self, bdd: BDD):
+        self.variables = list(bdd.variables)
+        levels = {var: i for i, var in enumerate(self.variables)}
+        n = len(self.variables)
+
+        internal = [node for node in bdd.breadth_first_bottom_up_search() if not node.isLeaf()]
+        #sorted by level so each level is a contiguous block, leafs are placed on level n
+        internal.sort(key=lambda node: levels[variable_name(node)])
+        index = {}
+        for node in bdd.breadth_first_bottom_up_search():
+            if node.isLeaf():
+                index[id(node)] = self.TRUE if node.value else self.FALSE
+        for i, node in enumerate(internal):
+            index[id(node)] = i + 2
+
+        size = len(internal) + 2
+        self.level = np.full(size, n, dtype=np.int32)
+        self.negative = np.array([self.FALSE, self.TRUE] + [0] * len(internal), dtype=np.int32)
+        self.positive = self.negative.copy()
+        for i, node in enumerate(internal):
+            self.level[i + 2] = levels[variable_name(node)]
+            self.negative[i + 2] = index[id(node.negative_child)]
+            self.positive[i + 2] = index[id(node.positive_child)]
+        #children[2 * i + bit] is the child of node i for the variable value bit
+        self.children = np.stack((self.negative, self.positive), axis=1).ravel()
+        self.root = index[id(bdd.root)]
+        #level_start[l]:level_start[l + 1] are the nodes of level l
+        self.level_start = np.searchsorted(self.level[2:], np.arange(n + 2)) + 2
+        #alt[l]: variable l is an alt variable x_, it is weighted with the table of x
+        alt_variables = {variable_name(node) for node in internal if node.is_alt}
+        self.alt = np.array([var in alt_variables for var in self.variables], dtype=bool)
+        #table_variables[l]: variable of the probability table of level l, x for both x and x_
+        #(also for levels without nodes, e.g. y_ when the guard ignores y, so all of them have a table)
+        self.table_variables = [var[:-1] if alt or (var.endswith("_") and var[:-1] in levels) else var
+                                for var, alt in zip(self.variables, self.alt)]
+        #conditional[2 * i + bit]: the child is x_ and node i tests x, the edge is weighted with P(x'|x = bit)
+        tables = {var: i for i, var in enumerate(dict.fromkeys(self.table_variables))}
+        #one past the last level are the leafs, they get no table
+        table_of_level = np.array([tables[var] for var in self.table_variables] + [-1], dtype=np.int32)
+        alt_of_level = np.append(self.alt, False)
+        child_level = self.level[self.children]
+        parent_level = np.repeat(self.level, 2)
+        self.conditional = ((table_of_level[child_level] == table_of_level[parent_level]) & (child_level < n)
+                            & alt_of_level[child_level] & ~alt_of_level[parent_level])
+
+    def __len__(self):
+        return len(self.level)
+
+    # read only from now on: the arrays can't be written and no attribute can be reassigned, see FrozenBDD
+    def freeze(self):
+        for array in (self.level, self.negative, self.positive, self.children, self.level_start, self.alt,
+                      self.conditional):
+            array.flags.writeable = False
+        self.variables = tuple(self.variables)
+        self.table_variables = tuple(self.table_variables)
+        self.__frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_ArrayBDD__frozen", False):
+            raise Exception("the ArrayBDD is frozen")
+        super().__setattr__(name, value)
+
+    # evaluates the function for every row of observations (shape (samples, len(variables)), boolean)
+    # rows are processed in chunks that stay in cache; each step moves all samples of a chunk one node down
+    # with two gathers (variable value, child), samples that reached a leaf stay there
+    def evaluate(self, observations: np.ndarray, chunk_size: int = 1 << 15) -> np.ndarray:
+        observations = np.asarray(observations)
+        if observations.ndim != 2 or observations.shape[1] != len(self.variables):
+            raise Exception(f"expected observations of shape (samples, {len(self.variables)}), "
+                            f"got {observations.shape}")
+        samples, n = observations.shape
+        if self.root < 2:
+            return np.full(samples, self.root == self.TRUE)
+        result = np.empty(samples, dtype=bool)
+        #each row gets a padding column for the leafs' level, so the gather needs no mask
+        offsets = np.arange(chunk_size, dtype=np.int64) * (n + 1)
+        for start in range(0, samples, chunk_size):
+            chunk = observations[start:start + chunk_size]
+            rows = chunk.shape[0]
+            padded = np.zeros((rows, n + 1), dtype=np.uint8)
+            padded[:, :n] = chunk
+            bits = padded.ravel()
+            row_offsets = offsets[:rows]
+            current = np.full(rows, self.root, dtype=np.int32)
+            for step in range(n):
+                current = self.children[2 * current + bits[row_offsets + self.level[current]]]
+                if step % 8 == 7 and current.max() < 2:
+                    break
+            result[start:start + rows] = current == self.TRUE
+        return result
+
+    # probability of the True leaf for the 2x2 tables of the variables in floating point, the same value as
+    # FrozenBDD.weighted_count; the levels are processed bottom up, all nodes of a level in one vectorized step
+    def weighted_count(self, probabilities: dict[str, list], dtype=np.float64) -> float:
+        if self.root < 2:
+            return float(self.root == self.TRUE)
+        size = len(self.level)
+        #value[i]: probability of reaching True from node i, conditional[b][i]: same for alt nodes given x = b
+        value = np.zeros(size, dtype=dtype)
+        value[self.TRUE] = 1
+        conditional = (value.copy(), value.copy())
+        negative = self.children[0::2]
+        positive = self.children[1::2]
+        tables = np.array([[float(p) for p in probabilities[var]] for var in dict.fromkeys(self.table_variables)],
+                          dtype=dtype)
+        table_index = {var: i for i, var in enumerate(dict.fromkeys(self.table_variables))}
+        for level in range(len(self.variables) - 1, -1, -1):
+            start, end = self.level_start[level], self.level_start[level + 1]
+            if start == end:
+                continue
+            # x'\x     0        1
+            # 0    [0] p00  [1] p10
+            # 1    [2] p01  [3] p11
+            t = tables[table_index[self.table_variables[level]]]
+            neg = value[negative[start:end]]
+            pos = value[positive[start:end]]
+            if self.alt[level]:
+                value[start:end] = (t[0] + t[1]) * neg + (t[2] + t[3]) * pos
+                for bit in (0, 1):
+                    total = t[bit] + t[bit + 2]
+                    if total:
+                        conditional[bit][start:end] = (t[bit] * neg + t[bit + 2] * pos) / total
+                continue
+            #edges to x_ below x use the value given x
+            conditional_edges = self.conditional[2 * start:2 * end].reshape(-1, 2)
+            neg = np.where(conditional_edges[:, 0], conditional[0][negative[start:end]], neg)
+            pos = np.where(conditional_edges[:, 1], conditional[1][positive[start:end]], pos)
+            value[start:end] = (t[0] + t[2]) * neg + (t[1] + t[3]) * pos
+        return float(value[self.root])